@@ -0,0 +1,271 @@
+import os
+import time
+import heapq
+import random
+import asyncio
+import itertools
+import threading
+from contextvars import ContextVar
+from email.utils import parsedate_to_datetime
+from utility import count_tokens
+from metrics import LLM_QUEUE_DEPTH, LLM_QUEUE_SECONDS, LLM_REJECTED, LLM_RATE_LIMITED, LLM_TRANSIENT_ERRORS
+from tracing import logger
+
+# Provider limits for the whole process; 0 leaves that dimension unlimited. Set them to the
+# account's limits divided by the number of workers. A 429 pauses admissions either way.
+LLM_REQUESTS_PER_MINUTE = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "0"))
+LLM_TOKENS_PER_MINUTE = float(os.getenv("LLM_TOKENS_PER_MINUTE", "0"))
+# Completion tokens charged per call on top of the prompt estimate
+LLM_COMPLETION_TOKENS = int(os.getenv("LLM_COMPLETION_TOKENS", "256"))
+# New threads are refused with 503 once this many LLM calls are waiting; resumes get extra headroom
+LLM_QUEUE_SIZE = int(os.getenv("LLM_QUEUE_SIZE", "64"))
+LLM_QUEUE_RESUME_HEADROOM = int(os.getenv("LLM_QUEUE_RESUME_HEADROOM", "32"))
+# Retries of a call the provider rejected with 429, each after the pause it asked for
+LLM_RATE_LIMIT_RETRIES = int(os.getenv("LLM_RATE_LIMIT_RETRIES", "3"))
+# Retries of a call that failed on a connection error, timeout or 5xx, after a jittered exponential
+# backoff starting around LLM_RETRY_BACKOFF seconds; only that call waits
+LLM_TRANSIENT_RETRIES = int(os.getenv("LLM_TRANSIENT_RETRIES", "2"))
+LLM_RETRY_BACKOFF = float(os.getenv("LLM_RETRY_BACKOFF", "0.5"))
+
+# Lower runs first: a resume has a human waiting on the answer, a new thread is just starting to plan
+RESUME = 0
+NEW_THREAD = 1
+PRIORITY_NAMES = {RESUME: "resume", NEW_THREAD: "new_thread"}
+
+llm_priority = ContextVar("llm_priority", default=NEW_THREAD)
+
+
+class LLMOverloaded(Exception):
+    def __init__(self, retry_after):
+        super().__init__(f"LLM queue is full, retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    def __init__(self, per_minute, clock=time.monotonic):
+        self.rate = per_minute / 60
+        self.capacity = per_minute
+        self.level = per_minute
+        self.updated = clock()
+
+    def refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_for(self, amount):
+        """Seconds until `amount` is available (an amount above capacity only needs a full bucket)."""
+        missing = min(amount, self.capacity) - self.level
+        return max(missing / self.rate, 0.0)
+
+    def take(self, amount):
+        self.level -= min(amount, self.capacity)
+
+
+class _Waiter:
+    def __init__(self, priority, seq, tokens):
+        self.priority = priority
+        self.seq = seq
+        self.tokens = tokens
+        self.loop = None
+        self.event = None
+
+    def __lt__(self, other):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+    def notify(self):
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self.event.set)
+        else:
+            self.event.set()
+
+
+class LLMScheduler:
+    """Admission control shared by every chat model call in the process.
+
+    Calls wait in one priority queue (resumes before new threads, then FIFO) and are admitted
+    only from its head, when the request and token buckets allow it and no provider 429 pause
+    is in effect. Works for both sync callers (threads) and async callers (event loops).
+    """
+
+    def __init__(self, requests_per_minute=LLM_REQUESTS_PER_MINUTE, tokens_per_minute=LLM_TOKENS_PER_MINUTE,
+                 queue_size=LLM_QUEUE_SIZE, resume_headroom=LLM_QUEUE_RESUME_HEADROOM, clock=time.monotonic):
+        # Every deadline and refill reads this clock, so tests can move time by hand
+        self.clock = clock
+        self.requests = TokenBucket(requests_per_minute, clock) if requests_per_minute > 0 else None
+        self.tokens = TokenBucket(tokens_per_minute, clock) if tokens_per_minute > 0 else None
+        self.queue_size = queue_size
+        self.resume_headroom = resume_headroom
+        self.paused_until = 0.0
+        self._queue = []
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+    def depth(self):
+        return len(self._queue)
+
+    def admit(self, priority):
+        """Entry check for a new run: raise LLMOverloaded instead of queueing behind a full queue."""
+        limit = self.queue_size + (self.resume_headroom if priority == RESUME else 0)
+        depth = len(self._queue)
+        if depth >= limit:
+            LLM_REJECTED.inc(priority=PRIORITY_NAMES[priority])
+            raise LLMOverloaded(self._drain_estimate(depth))
+
+    def _drain_estimate(self, depth):
+        seconds = max(self.paused_until - self.clock(), 1.0)
+        if self.requests is not None:
+            seconds = max(seconds, depth / self.requests.rate)
+        return seconds
+
+    def pause(self, seconds):
+        with self._lock:
+            self.paused_until = max(self.paused_until, self.clock() + seconds)
+
+    def _enqueue(self, tokens, loop=None):
+        waiter = _Waiter(llm_priority.get(), next(self._seq), tokens)
+        # Ready to be notified before another caller can see it at the head of the queue
+        waiter.loop = loop
+        waiter.event = asyncio.Event() if loop is not None else threading.Event()
+        with self._lock:
+            heapq.heappush(self._queue, waiter)
+        LLM_QUEUE_DEPTH.inc(priority=PRIORITY_NAMES[waiter.priority])
+        return waiter
+
+    def _leave(self, waiter, start):
+        with self._lock:
+            if waiter in self._queue:
+                self._queue.remove(waiter)
+                heapq.heapify(self._queue)
+            head = self._queue[0] if self._queue else None
+        LLM_QUEUE_DEPTH.dec(priority=PRIORITY_NAMES[waiter.priority])
+        LLM_QUEUE_SECONDS.observe(self.clock() - start, priority=PRIORITY_NAMES[waiter.priority])
+        if head is not None:
+            head.notify()
+
+    def _try_admit(self, waiter):
+        """0 when admitted, otherwise how long to sleep before looking again (a notify may come sooner)."""
+        with self._lock:
+            if self._queue[0] is not waiter:
+                return 1.0
+            now = self.clock()
+            delay = self.paused_until - now
+            for bucket, amount in ((self.requests, 1), (self.tokens, waiter.tokens)):
+                if bucket is not None:
+                    bucket.refill(now)
+                    delay = max(delay, bucket.wait_for(amount))
+            if delay > 0:
+                return delay
+            for bucket, amount in ((self.requests, 1), (self.tokens, waiter.tokens)):
+                if bucket is not None:
+                    bucket.take(amount)
+            heapq.heappop(self._queue)
+            return 0
+
+    def acquire(self, tokens):
+        start = self.clock()
+        waiter = self._enqueue(tokens)
+        try:
+            while (delay := self._try_admit(waiter)) > 0:
+                waiter.event.wait(delay)
+                waiter.event.clear()
+        finally:
+            self._leave(waiter, start)
+
+    async def aacquire(self, tokens):
+        start = self.clock()
+        waiter = self._enqueue(tokens, asyncio.get_running_loop())
+        try:
+            while (delay := self._try_admit(waiter)) > 0:
+                try:
+                    await asyncio.wait_for(waiter.event.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                waiter.event.clear()
+        finally:
+            self._leave(waiter, start)
+
+
+def rate_limit_delay(error, attempt):
+    """Seconds the provider asked us to wait if `error` is a 429, else None."""
+    if getattr(error, "status_code", None) != 429:
+        return None
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    if headers.get("retry-after-ms"):
+        return float(headers["retry-after-ms"]) / 1000
+    retry_after = headers.get("retry-after")
+    if retry_after:
+        try:
+            return float(retry_after)
+        except ValueError:
+            return max(parsedate_to_datetime(retry_after).timestamp() - time.time(), 0.0)
+    return 2.0 ** attempt
+
+
+def transient_delay(error, attempt):
+    """Backoff before retrying `error` if it is a connection error, timeout or 5xx, else None."""
+    from openai import APIConnectionError
+    status = getattr(error, "status_code", None)
+    if not isinstance(error, APIConnectionError) and not (isinstance(status, int) and status >= 500):
+        return None
+    return LLM_RETRY_BACKOFF * 2 ** attempt * random.uniform(0.5, 1.5)
+
+
+class Admitted:
+    """Wraps a chat model runnable so every invoke/ainvoke is admitted by the scheduler first."""
+
+    def __init__(self, runnable, scheduler):
+        self.runnable = runnable
+        self.scheduler = scheduler
+
+    def _tokens(self, input):
+        return count_tokens(str(input)) + LLM_COMPLETION_TOKENS
+
+    def _retry_delay(self, error, attempt):
+        """Seconds this call sleeps before retrying `error`, or None to raise it."""
+        delay = rate_limit_delay(error, attempt)
+        if delay is not None:
+            LLM_RATE_LIMITED.inc()
+            if attempt >= LLM_RATE_LIMIT_RETRIES:
+                return None
+            logger.warning("LLM rate limited, pausing admissions for %.1fs", delay)
+            # Every caller waits out a 429; the next acquire() does the waiting
+            self.scheduler.pause(delay)
+            return 0.0
+        delay = transient_delay(error, attempt)
+        if delay is None:
+            return None
+        LLM_TRANSIENT_ERRORS.inc()
+        if attempt >= LLM_TRANSIENT_RETRIES:
+            return None
+        logger.warning("LLM call failed (%s), retrying in %.1fs", error, delay)
+        return delay
+
+    def invoke(self, input, config=None, **kwargs):
+        tokens = self._tokens(input)
+        for attempt in itertools.count():
+            self.scheduler.acquire(tokens)
+            try:
+                return self.runnable.invoke(input, config, **kwargs)
+            except Exception as e:
+                delay = self._retry_delay(e, attempt)
+                if delay is None:
+                    raise
+            time.sleep(delay)
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        tokens = self._tokens(input)
+        for attempt in itertools.count():
+            await self.scheduler.aacquire(tokens)
+            try:
+                return await self.runnable.ainvoke(input, config, **kwargs)
+            except Exception as e:
+                delay = self._retry_delay(e, attempt)
+                if delay is None:
+                    raise
+            await asyncio.sleep(delay)
+
+    def __getattr__(self, name):
+        return getattr(self.runnable, name)
+
+
+llm_scheduler = LLMScheduler()
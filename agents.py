@@ -1,15 +1,37 @@
 import os
+import re
+import time
 from typing import List, Union
-from langchain.chat_models import init_chat_model
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, ValidationError
+from langchain_core.messages import AIMessage
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_openai import ChatOpenAI
 from dotenv import load_dotenv
-from tools import create_data_collection, get_all_data_collection, get_collection_by_name, update_data_collection, delete_data_collection, talk_to_human
+from tools import create_data_collection, get_all_data_collection, get_collection_by_name, update_data_collection, delete_data_collection, talk_to_human, create_data_collections_batch, update_data_collections_batch, delete_data_collections_batch, runnable_tool_calls
+from tracing import log_sampled, logger
+from admission import Admitted, llm_scheduler
+from metrics import MODEL_TIER_SECONDS, MODEL_ESCALATIONS
 load_dotenv()
 
-if not os.getenv("OPENAI_API_KEY"):
-    raise ValueError("OPENAI_API_KEY is not set. Please export it or add it to .env") 
+# Chat model per node, as init_chat_model "provider:model" strings; LLM_MODEL is the default for all
+LLM_MODEL = os.getenv("LLM_MODEL", "openai:gpt-4.1")
+AGENT_MODEL = os.getenv("AGENT_MODEL", LLM_MODEL)
+PLANNER_MODEL = os.getenv("PLANNER_MODEL", LLM_MODEL)
+REPLANNER_MODEL = os.getenv("REPLANNER_MODEL", LLM_MODEL)
+FUSED_AGENT_MODEL = os.getenv("FUSED_AGENT_MODEL", LLM_MODEL)
+SUMMARIZER_MODEL = os.getenv("SUMMARIZER_MODEL", REPLANNER_MODEL)
+# 'single': the agent step runs on AGENT_MODEL.
+# 'cascade': it runs on AGENT_SMALL_MODEL first and only goes to AGENT_MODEL when the small model's
+# tool call does not validate against the tool schemas or does not match the instruction.
+AGENT_MODEL_MODE = os.getenv("AGENT_MODEL_MODE", "single")
+AGENT_SMALL_MODEL = os.getenv("AGENT_SMALL_MODEL", "openai:gpt-4.1-mini")
+
+# langchain.chat_models and langchain_openai are the slowest imports of the process, and only
+# the registry needs them, so they are loaded when the registry is first built.
+# The SDK's own retries are off: a 429 has to reach Admitted so the scheduler pauses every caller.
+def init_chat_model(*args, **kwargs):
+    from langchain.chat_models import init_chat_model
+    kwargs.setdefault("max_retries", 0)
+    return init_chat_model(*args, **kwargs)
 
 class Response(BaseModel):
         """Response to user."""
@@ -22,6 +44,16 @@ class Plan(BaseModel):
         description="List of concrete, ordered steps to follow. Each step must use only one tool."
     )
 
+class NextStep(BaseModel):
+    """Next instruction for the agent and the original plan step it carries out"""
+
+    instruction: str = Field(
+        description="A clear single step instruction containing all the information, or 'END' once the objective is achieved."
+    )
+    plan_step: int = Field(
+        description="1-based number of the original plan step this instruction carries out, or 0 if it is an extra step that is not in the plan."
+    )
+
 class Act(BaseModel):
     """Updated execution plan"""
 
@@ -31,34 +63,163 @@ class Act(BaseModel):
     )
 
 
-def get_main_agent(query, metadata):
-
-    model = init_chat_model("openai:gpt-4.1")
+AGENT_INSTRUCTIONS = """
+You are an expert data_collection manager inside a dashboard, you are equipped with necessary tools to complete given tasks
+Your main goal is to complete the CURRENT TASK given at the end of the conversation.
 
-    tools = [create_data_collection, get_all_data_collection, get_collection_by_name, update_data_collection, delete_data_collection, talk_to_human]
+INSTRUCTIONS
+- Just perform the tasks which are given to you(Do not do additional tasks on your own).
+- Use the information mentioned in the METADATA if you want.
+- You must use only one tool at once, except get_all_data_collections and get_collection_by_name: several of those may be called together (e.g. to fetch details of multiple collections).
+"""
 
-    model = model.bind_tools(tools)    
+def _agent_prompt(query, metadata):
+    # Static instructions first and per-step data last, so consecutive calls share a cacheable prefix.
+    # The history only grows within a thread, so it goes before the instruction that changes every step.
+    return [
+        ("system", AGENT_INSTRUCTIONS),
+        ("user", f"METADATA\n{metadata}\n\nCURRENT TASK\n{query}"),
+    ]
+
+AGENT_TOOLS = [create_data_collection, get_all_data_collection, get_collection_by_name, update_data_collection, delete_data_collection, talk_to_human, create_data_collections_batch, update_data_collections_batch, delete_data_collections_batch]
+
+def _describe_fields(schema, defs):
+    required = schema.get("required", [])
+    parts = []
+    for name, field in schema.get("properties", {}).items():
+        text = f"`{name}`"
+        ref = field.get("items", {}).get("$ref")
+        if ref:
+            item = defs[ref.rsplit("/", 1)[-1]]
+            text += f" (list of {{{', '.join(f'`{n}`' for n in item.get('properties', {}))}}}, {'/'.join(item.get('required', [])) or 'no field'} required)"
+        elif field.get("description") and name in required:
+            text += f" ({field['description']})"
+        parts.append(text if name in required else f"{text} optional")
+    return ", ".join(parts)
+
+def _tool_catalog(tools):
+    """One line per tool, generated from the @tool schemas so prompts never drift from the real signatures."""
+    lines = []
+    for tool in tools:
+        schema = tool.tool_call_schema.model_json_schema()
+        fields = _describe_fields(schema, schema.get("$defs", {}))
+        lines.append(f"- **{tool.name}**: {tool.description}." + (f" Args: {fields}." if fields else ""))
+    return "\n".join(lines)
+
+TOOL_CATALOG = _tool_catalog(AGENT_TOOLS)
+
+def _agent_model(model=AGENT_MODEL):
+    model = init_chat_model(model)
+
+    return model.bind_tools(AGENT_TOOLS)
+
+AGENT_TOOLS_BY_NAME = {tool.name: tool for tool in AGENT_TOOLS}
+
+def _current_task(prompt):
+    return prompt[-1][1].split("CURRENT TASK\n", 1)[-1]
+
+def escalation_reason(message, prompt):
+    """Why an agent answer to `prompt` cannot be used as is, or None when it can."""
+    if message.invalid_tool_calls:
+        return "invalid_args"
+    if not message.tool_calls:
+        return "no_tool_call"
+    if len(runnable_tool_calls(message.tool_calls)) < len(message.tool_calls):
+        return "multiple_calls"
+    # Instructions normally name their tool ("... using delete_data_collection")
+    instruction = _current_task(prompt)
+    # Whole identifiers only: delete_data_collection is part of delete_data_collections_batch
+    named = set(re.findall(r"\w+", instruction)) & AGENT_TOOLS_BY_NAME.keys()
+    for tool_call in message.tool_calls:
+        tool = AGENT_TOOLS_BY_NAME.get(tool_call["name"])
+        if tool is None:
+            return "unknown_tool"
+        if named and tool_call["name"] not in named:
+            return "wrong_tool"
+        try:
+            tool.tool_call_schema.model_validate(tool_call["args"])
+        except ValidationError:
+            return "invalid_args"
+    return None
+
+class ModelCascade:
+    """Runs a step on the small model and escalates to the large one when `check` rejects the answer."""
+
+    def __init__(self, small, large, check):
+        self.small = small
+        self.large = large
+        self.check = check
+
+    def _small_outcome(self, response, error, input):
+        if error is not None:
+            logger.warning("small model failed, escalating: %s", error)
+            return "error"
+        return self.check(response, input)
+
+    def invoke(self, input, config=None, **kwargs):
+        start = time.perf_counter()
+        response = error = None
+        try:
+            response = self.small.invoke(input, config, **kwargs)
+        except Exception as e:
+            error = e
+        reason = self._small_outcome(response, error, input)
+        MODEL_TIER_SECONDS.observe(time.perf_counter() - start, tier="small", outcome="accepted" if reason is None else "escalated")
+        if reason is None:
+            return response
+        MODEL_ESCALATIONS.inc(reason=reason)
+        start = time.perf_counter()
+        try:
+            response = self.large.invoke(input, config, **kwargs)
+        except Exception:
+            MODEL_TIER_SECONDS.observe(time.perf_counter() - start, tier="large", outcome="error")
+            raise
+        MODEL_TIER_SECONDS.observe(time.perf_counter() - start, tier="large", outcome="accepted")
+        return response
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        start = time.perf_counter()
+        response = error = None
+        try:
+            response = await self.small.ainvoke(input, config, **kwargs)
+        except Exception as e:
+            error = e
+        reason = self._small_outcome(response, error, input)
+        MODEL_TIER_SECONDS.observe(time.perf_counter() - start, tier="small", outcome="accepted" if reason is None else "escalated")
+        if reason is None:
+            return response
+        MODEL_ESCALATIONS.inc(reason=reason)
+        start = time.perf_counter()
+        try:
+            response = await self.large.ainvoke(input, config, **kwargs)
+        except Exception:
+            MODEL_TIER_SECONDS.observe(time.perf_counter() - start, tier="large", outcome="error")
+            raise
+        MODEL_TIER_SECONDS.observe(time.perf_counter() - start, tier="large", outcome="accepted")
+        return response
+
+    def __getattr__(self, name):
+        return getattr(self.large, name)
 
-    prompt = f"""
-    You are an expert data_collection manager inside a dashboard, you are equipped with necessary tools to complete given tasks
-    Your main goal is to complete the current task.
+def get_main_agent(query, metadata):
 
-    CURRENT TASK
-    {query}
+    model = get_registry().agent
 
-    METADATA
-    {metadata}
-    
-    INSTRUCTIONS
-    - Just perform the tasks which are given to you(Do not do additional tasks on your own).
-    - Use the information mentioned in the metadata if you want.
-    - You must use only one tool at once.
-    """
-    print(f"agent running with >>>>>>>>>>>>>>>>>>>>>>>>>>>>>>> {prompt}")
+    prompt = _agent_prompt(query, metadata)
+    log_sampled("agent prompt", prompt[-1][1])
     response = model.invoke(prompt)
     return {"messages": [response]}
 
-def get_planner():
+async def aget_main_agent(query, metadata):
+
+    model = get_registry().agent
+
+    prompt = _agent_prompt(query, metadata)
+    log_sampled("agent prompt", prompt[-1][1])
+    response = await model.ainvoke(prompt)
+    return {"messages": [response]}
+
+def _build_planner():
     class Plan(BaseModel):
         """A clear, ordered list of executable steps for the agent."""
         steps: List[str] = Field(
@@ -82,18 +243,13 @@ Steps must be ordered logically. If any needed information is missing, **insert
 
 ## **Available Tools**
 
-- **create_data_collection**: Create a new data collection. Needs: `name`, `type` ('General' or 'Face Recognition'), `description`.
-- **get_all_data_collections**: Retrieve a list of all existing collections.
-- **get_collection_by_name**: Get details along with ID of a specific collection by its name.
-- **update_data_collection**: Update a collection. Needs: `id` plus any of `name`, `type`, `description`.
-- **delete_data_collection**: Delete a collection by `id`.
-- **talk_to_human**: To explain user anything, provide user insights or ask the user any question to get missing information.   
+{tool_catalog}
 
 ---
 
 ## **Guidelines**
 
-1 Use exactly ONE tool per step — no multi-tool actions.  
+1 Use exactly ONE tool per step — no multi-tool actions. Only exception: one step may fetch several collections at once with get_collection_by_name (e.g. "Get details of collections 'A', 'B' and 'C' using get_collection_by_name").  
 2 Always retrieve collection IDs before updating or deleting.  
 3 If you don't have a required value (like a new description), insert a **talk_to_human** step immediately before the action.
 4 To explain anything to user or provide any collection info to user, add **talk_to_human** step. 
@@ -104,6 +260,8 @@ Steps must be ordered logically. If any needed information is missing, **insert
    - "Update collection with ID 123 using update_data_collection with the new description."
 
 6 Do not invent tools or actions that are not listed.   
+7 When the same create, update or delete applies to more than one collection, use ONE step with the matching *_batch tool instead of one step per collection (e.g. "Delete collections with IDs 12, 15 and 19 using delete_data_collections_batch").
+8 get_all_data_collections returns one page (id, name and type by default); when looking for particular collections, say which name or type to filter on in the step instead of listing everything.
 
 ---
 
@@ -113,25 +271,46 @@ Return only the plan —
 A numbered list of clear, plain-text steps, each describing which tool will be used and for what.
 
 Do not add extra explanation, apologies, or commentary.
-""",
+""".replace("{tool_catalog}", TOOL_CATALOG.replace("{", "{{").replace("}", "}}")),
             ),
             ("placeholder", "{messages}"),
         ]
     )
 
-    planner = planner_prompt | ChatOpenAI(
-        model="gpt-4.1",
+    planner = planner_prompt | init_chat_model(
+        PLANNER_MODEL,
         temperature=0
     ).with_structured_output(Plan)
 
     return planner
 
-def get_replanner(task, plan, history):
+def get_planner():
+    return get_registry().planner
 
-    replanner_prompt = f"""
+REPLANNER_INSTRUCTIONS = f"""
 You are a **Precise instructor** for an agentic system that executes one step at a time.
+You are given the Objective, the Original Plan and the Previous Step Results.
+
+## **Your job:**
 
-## Objective:
+1. Carefully Inspect the results of completed steps and identify the state of the task.
+2. Create a proper instruction for an agent with tool name and its parameters in a sentence. Several collections may be fetched in one instruction with get_collection_by_name; every other tool handles one call per instruction.
+
+## **Agent has below tools:**
+{TOOL_CATALOG}
+
+---
+
+## **Output Format**
+- A clear single step instruction containing all the information.
+
+## IMPORTANT NOTE
+- Once all the steps are completed and the objective is achieved just return 'END' without any special characters.
+"""
+
+def _run_state(task, plan, history):
+    # Task and plan are fixed for a thread and the history only grows, in that order
+    return f"""## Objective:
 {task}
 
 ## Original Plan:
@@ -139,33 +318,143 @@ You are a **Precise instructor** for an agentic system that executes one step at
 
 ## Previous Step Results:
 {history}
+"""
 
----
+def _replanner_prompt(task, plan, history):
+    return [("system", REPLANNER_INSTRUCTIONS), ("user", _run_state(task, plan, history))]
+
+FUSED_INSTRUCTIONS = """
+You are an expert data_collection manager inside a dashboard that executes a plan one tool call at a time.
+You are given the Objective, the Original Plan and the Previous Step Results.
 
 ## **Your job:**
 
 1. Carefully Inspect the results of completed steps and identify the state of the task.
-2. Create a proper instruction for an agent with tool name and its parameters in a sentence.
+2. Call exactly ONE tool for the next step, with all of its arguments filled in from the results. Only get_all_data_collections and get_collection_by_name may be called several times at once.
+3. Once all the steps are completed and the objective is achieved, call `Response` with a short final answer for the user instead of a tool.
 
-## **Agent has below tools:**
-- **create_data_collection**: Create a new data collection. Needs: `name`, `type` ('General' or 'Face Recognition'), `description`.
-- **get_all_data_collections**: Retrieve a list of all existing collections.
-- **get_collection_by_name**: Get details and ID of a specific collection by its name.
-- **update_data_collection**: Update a collection. Needs: `id` plus any of `name`, `type`, `description`.
-- **delete_data_collection**: Delete a collection by `id`.
-- **talk_to_human**: Provide user insights of any tool output or ask the user any question to get missing information or confirmation.
+## INSTRUCTIONS
+- Just perform the tasks which are given to you(Do not do additional tasks on your own).
+- If a required value is missing, use talk_to_human to ask the user for it.
+"""
 
+def _fused_prompt(task, plan, history):
+    return [("system", FUSED_INSTRUCTIONS), ("user", _run_state(task, plan, history))]
 
----
+def _fused_result(response):
+    tool_call = response.tool_calls[0] if response.tool_calls else None
+    if tool_call is None or tool_call["name"] == Response.__name__:
+        answer = tool_call["args"].get("response", "") if tool_call else response.content
+        return {"messages": [AIMessage(content=answer)], "current_instruction": "END"}
+    response.tool_calls = runnable_tool_calls(response.tool_calls)
+    return {"messages": [response], "current_instruction": f"{tool_call['name']} {tool_call['args']}"}
 
-## **Output Format**
-- A clear single step instruction containing all the information.
+def get_fused_agent(task, plan, history):
 
-## IMPORTANT NOTE
-- Once all the steps are completed and the objective is achieved just return 'END' without any special characters.
+    prompt = _fused_prompt(task, _numbered_plan(plan), history)
+
+    response = get_registry().fused_agent.invoke(prompt)
+    return _fused_result(response)
+
+async def aget_fused_agent(task, plan, history):
+
+    prompt = _fused_prompt(task, _numbered_plan(plan), history)
+
+    response = await get_registry().fused_agent.ainvoke(prompt)
+    return _fused_result(response)
+
+SUMMARY_INSTRUCTIONS = """
+Condense the earlier steps of an agent run into a short summary for the agent that continues it.
+Keep every collection id, name, type and description that was mentioned, every user decision or feedback, and which steps already succeeded or failed.
+Return only the updated summary.
 """
 
-    llm = init_chat_model("openai:gpt-4.1")
+def _summary_prompt(summary, lines):
+    history = '\n'.join(lines)
+    return [("system", SUMMARY_INSTRUCTIONS), ("user", f"""## Summary so far:
+{summary}
+
+## Steps to add to the summary:
+{history}
+""")]
+
+def summarize_history(summary, lines):
+    response = get_registry().summarizer.invoke(_summary_prompt(summary, lines))
+    return response.content
+
+async def asummarize_history(summary, lines):
+    response = await get_registry().summarizer.ainvoke(_summary_prompt(summary, lines))
+    return response.content
+
+def _numbered_plan(plan):
+    return '\n'.join(f"{i}. {step}" for i, step in enumerate(plan, start=1))
+
+def get_replanner(task, plan, history):
+
+    replanner_prompt = _replanner_prompt(task, plan, history)
+
+    llm = get_registry().replanner
     response = llm.invoke(replanner_prompt)
 
-    return {'current_instruction': response.content}            
\ No newline at end of file
+    return {'current_instruction': response.content}
+
+async def aget_replanner(task, plan, history):
+
+    replanner_prompt = _replanner_prompt(task, plan, history)
+
+    llm = get_registry().replanner
+    response = await llm.ainvoke(replanner_prompt)
+
+    return {'current_instruction': response.content}
+
+
+def get_cursor_replanner(task, plan, history):
+
+    replanner_prompt = _replanner_prompt(task, _numbered_plan(plan), history)
+
+    llm = get_registry().cursor_replanner
+    step = llm.invoke(replanner_prompt)
+
+    return {'current_instruction': step.instruction, 'plan_cursor': step.plan_step - 1 if 0 < step.plan_step <= len(plan) else -1}
+
+async def aget_cursor_replanner(task, plan, history):
+
+    replanner_prompt = _replanner_prompt(task, _numbered_plan(plan), history)
+
+    llm = get_registry().cursor_replanner
+    step = await llm.ainvoke(replanner_prompt)
+
+    return {'current_instruction': step.instruction, 'plan_cursor': step.plan_step - 1 if 0 < step.plan_step <= len(plan) else -1}
+
+
+class RunnableRegistry:
+    """Chat models, tool bindings and prompt templates for every node, built once per process.
+
+    Building them per call re-validated the model config, re-converted the tool schemas and
+    re-parsed the planner prompt on every step; the shared instances also keep reusing
+    the same OpenAI HTTP connection pool.
+    """
+
+    def __init__(self):
+        # Checked here rather than at import so tooling can import the app without credentials
+        if not os.getenv("OPENAI_API_KEY"):
+            raise ValueError("OPENAI_API_KEY is not set. Please export it or add it to .env")
+        replanner = init_chat_model(REPLANNER_MODEL)
+        # Every model call goes through the process-wide admission queue and rate limits
+        self.agent = Admitted(_agent_model(AGENT_MODEL), llm_scheduler)
+        if AGENT_MODEL_MODE == "cascade":
+            self.agent = ModelCascade(Admitted(_agent_model(AGENT_SMALL_MODEL), llm_scheduler), self.agent, escalation_reason)
+        self.planner = Admitted(_build_planner(), llm_scheduler)
+        self.replanner = Admitted(replanner, llm_scheduler)
+        self.summarizer = self.replanner if SUMMARIZER_MODEL == REPLANNER_MODEL else Admitted(init_chat_model(SUMMARIZER_MODEL), llm_scheduler)
+        self.cursor_replanner = Admitted(replanner.with_structured_output(NextStep), llm_scheduler)
+        # One call per step: either the next tool call or a final Response
+        self.fused_agent = Admitted(init_chat_model(FUSED_AGENT_MODEL).bind_tools(AGENT_TOOLS + [Response], tool_choice="required"), llm_scheduler)
+
+_registry = None
+
+def get_registry():
+    global _registry
+    if _registry is None:
+        _registry = RunnableRegistry()
+    return _registry
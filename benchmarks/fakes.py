@@ -0,0 +1,329 @@
+"""Offline stand-ins for the OpenAI models and the dashboard API, used by the benchmarks.
+
+ScriptedChatModel answers every prompt the graph sends (planner, replanner, agent, fused agent,
+summarizer) deterministically from the task text and the step history embedded in the prompt,
+for the task shapes in TASKS. StubDashboard serves an in-memory /api/boxes.
+"""
+import os
+import re
+import json
+import time
+import uuid
+import asyncio
+import threading
+from collections import defaultdict
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+from typing import Any
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatResult, ChatGeneration
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+TASKS = {
+    "create": re.compile(r"^Create a General collection named '(.+?)'"),
+    "update": re.compile(r"^Update the description of collection '(.+?)'"),
+    "delete": re.compile(r"^Delete collection '(.+?)'"),
+    "list": re.compile(r"^List all collections"),
+}
+DESCRIPTION = "Created by the benchmark"
+TOOL_RESULT = re.compile(r"^TOOL: (\w+) returned -> (.*)$", re.MULTILINE)
+
+
+def task_text(kind, name):
+    return {
+        "create": f"Create a General collection named '{name}' with description '{DESCRIPTION}'",
+        "update": f"Update the description of collection '{name}'",
+        "delete": f"Delete collection '{name}'",
+        "list": "List all collections",
+    }[kind]
+
+
+def classify(task):
+    for kind, pattern in TASKS.items():
+        match = pattern.search(task.strip())
+        if match:
+            return kind, (match.group(1) if match.groups() else None)
+    raise ValueError(f"ScriptedChatModel has no script for task: {task!r}")
+
+
+def plan_for(task):
+    kind, name = classify(task)
+    lookup = f"Get details of collection named '{name}' using get_collection_by_name"
+    return {
+        "create": [f"Create a data collection named '{name}' of type 'General' with description '{DESCRIPTION}' using create_data_collection"],
+        "update": [
+            lookup,
+            f"Ask the user: What should be the new description for collection '{name}'? using talk_to_human",
+            f"Update the collection '{name}' using update_data_collection with the new description",
+        ],
+        "delete": [lookup, f"Delete the collection '{name}' using delete_data_collection"],
+        "list": ["Get all data collections using get_all_data_collections"],
+    }[kind]
+
+
+def tool_results(history):
+    results = []
+    for tool_name, payload in TOOL_RESULT.findall(history):
+        try:
+            results.append((tool_name, json.loads(payload)))
+        except ValueError:
+            results.append((tool_name, payload))
+    return results
+
+
+def _rejection_feedback(result):
+    tool_name, payload = result
+    if tool_name == "update_data_collection" and isinstance(payload, dict) and "USER FEEDBACK:" in payload.get("message", ""):
+        return payload["message"].split("USER FEEDBACK:", 1)[1].strip()
+    return None
+
+
+def next_step(task, history):
+    """(instruction, 1-based plan step) the replanner would choose next; ('END', 0) when done."""
+    kind, name = classify(task)
+    plan = plan_for(task)
+    results = tool_results(history)
+    if results and (feedback := _rejection_feedback(results[-1])) is not None:
+        return f"Update the collection '{name}' using update_data_collection with description '{feedback}'", len(plan)
+    done = sum(1 for result in results if _rejection_feedback(result) is None)
+    if done >= len(plan):
+        return "END", 0
+    return plan[done], done + 1
+
+
+def act(instruction, history):
+    """The single tool call an agent would make for `instruction`."""
+    results = tool_results(history)
+    found = [payload for tool_name, payload in results if tool_name == "get_collection_by_name" and isinstance(payload, dict)]
+    collection_id = str(found[-1]["id"]) if found else "unknown"
+    if "create_data_collection" in instruction:
+        name, type, description = re.search(r"named '(.+?)' of type '(.+?)' with description '(.+?)'", instruction).groups()
+        return "create_data_collection", {"name": name, "type": type, "description": description}
+    if "get_collection_by_name" in instruction:
+        return "get_collection_by_name", {"name": re.search(r"'(.+?)'", instruction).group(1)}
+    if "get_all_data_collections" in instruction:
+        return "get_all_data_collections", {}
+    if "talk_to_human" in instruction:
+        return "talk_to_human", {"question": instruction.split(" using ")[0]}
+    if "update_data_collection" in instruction:
+        match = re.search(r"with description '(.+?)'", instruction)
+        answers = [payload for tool_name, payload in results if tool_name == "talk_to_human"]
+        description = match.group(1) if match else str(answers[-1] if answers else DESCRIPTION)
+        return "update_data_collection", {"id": collection_id, "description": description}
+    if "delete_data_collection" in instruction:
+        return "delete_data_collection", {"id": collection_id}
+    return None
+
+
+def _section(prompt, start, *ends):
+    """Text after `start` up to the first of `ends` that follows it, or to the end of the prompt."""
+    begin = prompt.find(start)
+    if begin < 0:
+        return ""
+    begin += len(start)
+    stops = [i for i in (prompt.find(end, begin) for end in ends) if i >= 0]
+    return prompt[begin:min(stops, default=len(prompt))].strip()
+
+
+class PrefixCache:
+    """Approximates OpenAI prompt caching: requests of at least 1024 tokens reuse the longest prefix
+    shared with a recent request routed to the same machine, in 128-token increments.
+
+    Requests are routed by their first ~256 tokens, so only those are compared.
+    """
+
+    MIN_TOKENS = 1024
+    INCREMENT = 128
+    ROUTING_CHARS = 1024
+
+    def __init__(self, per_route=16):
+        self.per_route = per_route
+        self._recent = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def cached_tokens(self, request):
+        if len(request) // 4 < self.MIN_TOKENS:
+            return 0
+        with self._lock:
+            recent = self._recent[request[:self.ROUTING_CHARS]]
+            shared = max((len(os.path.commonprefix([request, previous])) for previous in recent), default=0)
+            recent.append(request)
+            del recent[:-self.per_route]
+        tokens = shared // 4
+        return tokens // self.INCREMENT * self.INCREMENT if tokens >= self.MIN_TOKENS else 0
+
+
+class LLMStats:
+    """LLM calls, prompt size and simulated cached tokens per thread_id, keyed by the callback metadata LangGraph attaches."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = defaultdict(int)
+        self.prompt_bytes = defaultdict(int)
+        self.prompt_tokens = defaultdict(int)
+        self.cached_tokens = defaultdict(int)
+        self.prefix_cache = PrefixCache()
+
+    def record(self, thread_id, prompt, prompt_tokens, cached_tokens):
+        with self._lock:
+            self.calls[thread_id] += 1
+            self.prompt_bytes[thread_id] += len(prompt.encode())
+            self.prompt_tokens[thread_id] += prompt_tokens
+            self.cached_tokens[thread_id] += cached_tokens
+
+
+class ScriptedChatModel(BaseChatModel):
+    latency: float = 0.0
+    stats: Any = None
+
+    @property
+    def _llm_type(self):
+        return "scripted"
+
+    def bind_tools(self, tools, tool_choice=None, **kwargs):
+        return self.bind(tools=[convert_to_openai_tool(tool) for tool in tools], tool_choice=tool_choice, **kwargs)
+
+    def _respond(self, messages, tools):
+        # Everything the graph puts per turn is in the last message, after any static instructions
+        prompt = str(messages[-1].content)
+        names = [tool["function"]["name"] for tool in tools or []]
+
+        if names == ["Plan"]:
+            return self._call("Plan", {"steps": plan_for(prompt)})
+
+        task = _section(prompt, "## Objective:", "## Original Plan:")
+        history = _section(prompt, "## Previous Step Results:", "---")
+        if names == ["NextStep"]:
+            instruction, plan_step = next_step(task, history)
+            return self._call("NextStep", {"instruction": instruction, "plan_step": plan_step})
+        if "Response" in names:
+            instruction, _ = next_step(task, history)
+            if instruction == "END":
+                return self._call("Response", {"response": "All steps are completed."})
+            return self._call(*act(instruction, history))
+        if names:
+            instruction = _section(prompt, "CURRENT TASK", "METADATA")
+            history = _section(prompt, "METADATA", "CURRENT TASK", "INSTRUCTIONS")
+            action = act(instruction, history)
+            return self._call(*action) if action else AIMessage(content="Nothing to do.")
+        if "## Objective:" in prompt:
+            return AIMessage(content=next_step(task, history)[0])
+        # Summarizer: keep the steps verbatim, since the other roles read their state from the history
+        summary = _section(prompt, "## Summary so far:", "## Steps to add to the summary:")
+        steps = _section(prompt, "## Steps to add to the summary:")
+        return AIMessage(content="\n".join(part for part in ("Earlier steps:", summary.removeprefix("Earlier steps:").strip(), steps) if part))
+
+    def _call(self, name, args):
+        return AIMessage(content="", tool_calls=[{"name": name, "args": args, "id": f"call_{uuid.uuid4().hex[:12]}"}])
+
+    def _result(self, messages, tools, run_manager):
+        message = self._respond(messages, tools)
+        # The provider sees tool definitions before the messages, so they are part of the cacheable prefix
+        request = json.dumps(tools or []) + "".join(f"\n{m.type}: {m.content}" for m in messages)
+        # Same ~4 chars per token estimate as utility.count_tokens
+        input_tokens = len(request) // 4 + 1
+        output_tokens = len(str(message.content) + json.dumps(message.tool_calls)) // 4 + 1
+        cached_tokens = 0
+        if self.stats is not None:
+            cached_tokens = self.stats.prefix_cache.cached_tokens(request)
+            thread_id = (run_manager.metadata or {}).get("thread_id") if run_manager else None
+            self.stats.record(thread_id, "\n".join(str(m.content) for m in messages), input_tokens, cached_tokens)
+        message.usage_metadata = {
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+            "input_token_details": {"cache_read": cached_tokens},
+        }
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages, stop=None, run_manager=None, tools=None, **kwargs):
+        time.sleep(self.latency)
+        return self._result(messages, tools, run_manager)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, tools=None, **kwargs):
+        await asyncio.sleep(self.latency)
+        return self._result(messages, tools, run_manager)
+
+
+class StubDashboard:
+    """In-memory /api/boxes on a local port, with a fixed per-request latency."""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.boxes = {}
+        self.requests = 0
+        self._next_id = 1
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/api/boxes"
+
+    def add(self, name, type="General", description=DESCRIPTION):
+        with self._lock:
+            box = {"id": str(self._next_id), "name": name, "type": type, "description": description}
+            self.boxes[box["id"]] = box
+            self._next_id += 1
+            return box
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _reply(self, status, body):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _request(self):
+                time.sleep(stub.latency)
+                with stub._lock:
+                    stub.requests += 1
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length)) if length else {}
+                return parse_qs(urlparse(self.path).query), body
+
+            def do_GET(self):
+                query, _ = self._request()
+                with stub._lock:
+                    if "name" in query:
+                        box = next((box for box in stub.boxes.values() if box["name"] == query["name"][0]), None)
+                        return self._reply(200, {"box": box}) if box else self._reply(404, {"error": "Not found"})
+                    return self._reply(200, {"boxes": list(stub.boxes.values())})
+
+            def do_POST(self):
+                _, body = self._request()
+                self._reply(201, {"box": stub.add(body["name"], body["type"], body["description"])})
+
+            def do_PUT(self):
+                _, body = self._request()
+                with stub._lock:
+                    box = stub.boxes.get(str(body.get("id")))
+                    if box is None:
+                        return self._reply(404, {"error": "Not found"})
+                    box.update({k: v for k, v in body.items() if k != "id"})
+                    return self._reply(200, {"box": box})
+
+            def do_DELETE(self):
+                query, _ = self._request()
+                with stub._lock:
+                    box = stub.boxes.pop(query.get("id", [""])[0], None)
+                return self._reply(200, {"message": "Deleted"}) if box else self._reply(404, {"error": "Not found"})
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
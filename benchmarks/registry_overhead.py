@@ -0,0 +1,43 @@
+"""Per-step cost of building the node runnables on every call vs. reusing the registry.
+
+Run from the repo root: python benchmarks/registry_overhead.py [iterations]
+No network calls are made; only construction and lookup are timed.
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+
+from langchain.chat_models import init_chat_model
+from agents import _agent_model, _build_planner, get_registry
+
+
+def rebuild_per_step():
+    # What every agent, planner and replanner step used to do before invoking the model
+    _agent_model()
+    _build_planner()
+    init_chat_model("openai:gpt-4.1")
+
+
+def registry_per_step():
+    registry = get_registry()
+    registry.agent, registry.planner, registry.replanner
+
+
+def timed(fn, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1000
+
+
+if __name__ == "__main__":
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    get_registry()
+    rebuild = timed(rebuild_per_step, iterations)
+    registry = timed(registry_per_step, iterations)
+    print(f"rebuild per step:  {rebuild:.3f} ms")
+    print(f"registry per step: {registry:.3f} ms")
+    print(f"saved per step:    {rebuild - registry:.3f} ms")
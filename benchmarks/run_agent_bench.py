@@ -0,0 +1,219 @@
+"""End-to-end /run-agent benchmark without OpenAI, Redis or the dashboard.
+
+The models come from benchmarks/fakes.py (ScriptedChatModel with a fixed per-call latency),
+/api/boxes is a local StubDashboard and the checkpointer is an InMemorySaver. Every task runs
+its interrupt/resume round-trips through the FastAPI app exactly as the frontend would.
+
+Run from the repo root:
+    python benchmarks/run_agent_bench.py --concurrency 1,4,16 --tasks 32 --output bench.json
+
+The JSON report has request latency percentiles, throughput per concurrency level, and
+LLM calls, prompt bytes/tokens and the share of prompt tokens a provider prefix cache would
+serve (see fakes.PrefixCache) per task kind, so runs can be diffed to catch regressions.
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import asyncio
+import argparse
+import itertools
+from contextlib import asynccontextmanager, contextmanager
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+# Single process, no Redis: thread leases are kept in memory
+os.environ.setdefault("THREAD_LOCK", "local")
+
+import httpx
+import numpy as np
+from langgraph.checkpoint.memory import InMemorySaver
+import agents
+import graph
+import main
+from dashboard import dashboard, collection_cache
+from fakes import ScriptedChatModel, StubDashboard, LLMStats, task_text
+
+KINDS = ["create", "update", "delete", "list"]
+FEEDBACK_DESCRIPTION = "Revised after review"
+# No scripted task needs more; a task that keeps asking means the fake and the prompts disagree
+MAX_ROUND_TRIPS = 10
+
+
+def install_fakes(args, stats):
+    def fake_model(*_, **__):
+        return ScriptedChatModel(latency=args.llm_latency, stats=stats)
+
+    agents.init_chat_model = fake_model
+    agents._registry = None
+
+    saver = InMemorySaver()
+
+    @asynccontextmanager
+    async def get_async_memory():
+        yield saver
+
+    @contextmanager
+    def get_memory():
+        yield saver
+
+    async def prune_checkpoints(thread_id):
+        pass
+
+    main.get_async_memory = get_async_memory
+    main.get_memory = get_memory
+    main.prune_checkpoints = prune_checkpoints
+    main.ASYNC_MODE = args.mode == "async"
+    graph.TOPOLOGY = args.topology
+    graph.EXECUTION_MODE = args.execution_mode
+    graph.PLAN_CACHE_ENABLED = args.plan_cache
+    agents.AGENT_MODEL_MODE = args.agent_model_mode
+
+
+def answer(interrupt, state):
+    """The resume payload a user would send for this interrupt."""
+    interrupt_args = interrupt.get("args") or {}
+    if not interrupt_args:
+        # talk_to_human: a free-text answer
+        return {"query": "Benchmark description", "args": {}}
+    if "feedback" in interrupt_args and not state["rejected"]:
+        # Reject the first update once so the replanner has to act on the feedback
+        state["rejected"] = True
+        return {"query": "", "args": {**interrupt_args, "send": "No", "feedback": FEEDBACK_DESCRIPTION}}
+    return {"query": "", "args": {**interrupt_args, "send": "Yes"}}
+
+
+async def run_task(client, kind, name, latencies):
+    thread_id = f"bench-{kind}-{uuid.uuid4().hex[:8]}"
+    payload = {"query": task_text(kind, name), "thread_id": thread_id}
+    state = {"rejected": False}
+    requests = 0
+    while True:
+        start = time.perf_counter()
+        response = await client.post("/run-agent", json=payload)
+        latencies.append(time.perf_counter() - start)
+        requests += 1
+        response.raise_for_status()
+        body = response.json()
+        if "interrupt" not in body:
+            return thread_id, requests
+        if requests >= MAX_ROUND_TRIPS:
+            raise RuntimeError(f"{thread_id} still interrupted after {requests} requests: {body}")
+        payload = {**answer(body, state), "thread_id": thread_id, "resume_flow": True}
+
+
+def percentiles(values):
+    if not values:
+        return {}
+    ms = np.array(values) * 1000
+    return {f"p{p}": round(float(np.percentile(ms, p)), 2) for p in (50, 90, 99)} | {"mean": round(float(ms.mean()), 2), "max": round(float(ms.max()), 2)}
+
+
+async def run_level(client, stub, concurrency, total, stats):
+    collection_cache.clear()
+    kinds = list(itertools.islice(itertools.cycle(KINDS), total))
+    jobs = []
+    for i, kind in enumerate(kinds):
+        name = f"bench-{concurrency}-{i}"
+        if kind in ("update", "delete"):
+            stub.add(name)
+        jobs.append((kind, name))
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def bounded(kind, name):
+        async with semaphore:
+            return kind, await run_task(client, kind, name, latencies)
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(bounded(kind, name) for kind, name in jobs))
+    elapsed = time.perf_counter() - start
+
+    per_kind = {}
+    for kind, (thread_id, requests) in results:
+        entry = per_kind.setdefault(kind, {"tasks": 0, "requests": 0, "llm_calls": 0, "prompt_bytes": 0, "prompt_tokens": 0, "cached_tokens": 0})
+        entry["tasks"] += 1
+        entry["requests"] += requests
+        entry["llm_calls"] += stats.calls[thread_id]
+        entry["prompt_bytes"] += stats.prompt_bytes[thread_id]
+        entry["prompt_tokens"] += stats.prompt_tokens[thread_id]
+        entry["cached_tokens"] += stats.cached_tokens[thread_id]
+    prompt_tokens = sum(entry["prompt_tokens"] for entry in per_kind.values())
+    cached_tokens = sum(entry["cached_tokens"] for entry in per_kind.values())
+    for entry in per_kind.values():
+        entry["cached_token_ratio"] = round(entry["cached_tokens"] / entry["prompt_tokens"], 3) if entry["prompt_tokens"] else 0.0
+        for key in ("requests", "llm_calls", "prompt_bytes", "prompt_tokens", "cached_tokens"):
+            entry[f"{key}_per_task"] = round(entry.pop(key) / entry["tasks"], 2)
+
+    return {
+        "concurrency": concurrency,
+        "tasks": total,
+        "requests": len(latencies),
+        "elapsed_s": round(elapsed, 3),
+        "tasks_per_s": round(total / elapsed, 2),
+        "requests_per_s": round(len(latencies) / elapsed, 2),
+        "latency_ms": percentiles(latencies),
+        "cached_token_ratio": round(cached_tokens / prompt_tokens, 3) if prompt_tokens else 0.0,
+        "per_task": per_kind,
+    }
+
+
+async def run(args):
+    stats = LLMStats()
+    install_fakes(args, stats)
+    stub = StubDashboard(latency=args.dashboard_latency).start()
+    dashboard.base_url = stub.url
+    levels = []
+    try:
+        async with main.lifespan(main.app):
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+                for concurrency in args.concurrency:
+                    level = await run_level(client, stub, concurrency, args.tasks, stats)
+                    print(f"concurrency {concurrency:>3}: {level['tasks_per_s']} tasks/s, p50 {level['latency_ms']['p50']} ms, p99 {level['latency_ms']['p99']} ms, cached tokens {level['cached_token_ratio']:.0%}")
+                    levels.append(level)
+    finally:
+        stub.stop()
+    return {
+        "config": {
+            "mode": args.mode,
+            "topology": args.topology,
+            "execution_mode": args.execution_mode,
+            "plan_cache": args.plan_cache,
+            "llm_latency_s": args.llm_latency,
+            "dashboard_latency_s": args.dashboard_latency,
+        },
+        "dashboard_requests": stub.requests,
+        "levels": levels,
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=lambda s: [int(c) for c in s.split(",")], default=[1, 4, 16])
+    parser.add_argument("--tasks", type=int, default=32, help="tasks per concurrency level, cycling create/update/delete/list")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="seconds per fake LLM call")
+    parser.add_argument("--dashboard-latency", type=float, default=0.005, help="seconds per stub dashboard request")
+    parser.add_argument("--mode", choices=["async", "sync"], default="async")
+    parser.add_argument("--topology", choices=["plan_execute", "fused"], default=graph.TOPOLOGY)
+    parser.add_argument("--execution-mode", choices=["replanner", "cursor"], default=graph.EXECUTION_MODE)
+    parser.add_argument("--agent-model-mode", choices=["single", "cascade"], default=agents.AGENT_MODEL_MODE)
+    parser.add_argument("--plan-cache", action="store_true", help="keep the planner cache on (in memory only)")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    # Never read or write the on-disk plan cache from a benchmark
+    graph.plan_cache.path = None
+    report = asyncio.run(run(args))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"report written to {args.output}")
+    else:
+        print(json.dumps(report, indent=2))
@@ -0,0 +1,109 @@
+"""Cold-start profile of the API process: `import main` plus the lifespan startup, in a fresh interpreter.
+
+Run from the repo root:
+    python benchmarks/startup_profile.py [--budget-ms 2500] [--top 15] [--output startup.json]
+
+The child process is started with -X importtime, so the report lists the slowest imports by
+cumulative time. The lifespan runs with an in-memory checkpointer (no Redis needed); building
+the registry and compiling the graph are timed as they would be on a real worker.
+Exits with status 1 when import + startup exceeds the budget, so CI can track regressions.
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import subprocess
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Worker readiness target: module import plus lifespan startup
+COLD_START_BUDGET_MS = float(os.getenv("COLD_START_BUDGET_MS", "2500"))
+
+
+def child():
+    sys.path.insert(0, REPO_ROOT)
+    os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+    from contextlib import asynccontextmanager
+
+    start = time.perf_counter()
+    import main
+    imported = time.perf_counter()
+
+    from langgraph.checkpoint.memory import InMemorySaver
+
+    @asynccontextmanager
+    async def get_async_memory():
+        yield InMemorySaver()
+
+    main.get_async_memory = get_async_memory
+    main.ASYNC_MODE = True
+
+    async def startup():
+        async with main.lifespan(main.app):
+            return time.perf_counter()
+
+    ready = asyncio.run(startup())
+    print(json.dumps({"import_ms": (imported - start) * 1000, "lifespan_ms": (ready - imported) * 1000}))
+
+
+def parse_importtime(stderr):
+    """[(module, self_us, cumulative_us)] from -X importtime output."""
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, module = line[len("import time:"):].split("|")
+        modules.append((module.strip(), int(self_us), int(cumulative_us)))
+    return modules
+
+
+def profile(top):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", os.path.abspath(__file__), "--child"],
+        cwd=REPO_ROOT, capture_output=True, text=True, check=True,
+    )
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    modules = parse_importtime(result.stderr)
+    # Top-level packages only, so a slow package is not listed once per submodule
+    roots = {}
+    for module, _, cumulative_us in modules:
+        root = module.split(".")[0]
+        roots[root] = max(roots.get(root, 0), cumulative_us)
+    return {
+        "import_ms": round(timings["import_ms"], 1),
+        "lifespan_ms": round(timings["lifespan_ms"], 1),
+        "cold_start_ms": round(timings["import_ms"] + timings["lifespan_ms"], 1),
+        "modules_imported": len(modules),
+        "slowest_packages": [{"package": name, "cumulative_ms": round(us / 1000, 1)} for name, us in sorted(roots.items(), key=lambda item: -item[1])[:top]],
+        "slowest_modules": [{"module": name, "self_ms": round(us / 1000, 1)} for name, us, _ in sorted(modules, key=lambda item: -item[1])[:top]],
+    }
+
+
+if __name__ == "__main__":
+    if "--child" in sys.argv:
+        child()
+        sys.exit(0)
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--budget-ms", type=float, default=COLD_START_BUDGET_MS)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--output", help="also write the JSON report here")
+    args = parser.parse_args()
+
+    report = profile(args.top)
+    report["budget_ms"] = args.budget_ms
+    report["within_budget"] = report["cold_start_ms"] <= args.budget_ms
+
+    print(f"import main:      {report['import_ms']:.1f} ms")
+    print(f"lifespan startup: {report['lifespan_ms']:.1f} ms")
+    print(f"cold start:       {report['cold_start_ms']:.1f} ms (budget {args.budget_ms:.0f} ms)")
+    print("slowest packages (cumulative):")
+    for entry in report["slowest_packages"]:
+        print(f"  {entry['cumulative_ms']:>8.1f} ms  {entry['package']}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if not report["within_budget"]:
+        print("cold start is over budget")
+        sys.exit(1)
@@ -0,0 +1,382 @@
+import os
+import threading
+from contextlib import contextmanager, asynccontextmanager
+import redis
+import redis.asyncio as aredis
+from cachetools import TTLCache
+from redisvl.query import FilterQuery
+from redisvl.query.filter import Tag
+from langchain_core.messages import RemoveMessage
+from langgraph.checkpoint.base import BaseCheckpointSaver, CheckpointTuple, WRITES_IDX_MAP, copy_checkpoint, get_checkpoint_id
+from langgraph.checkpoint.redis import RedisSaver
+from langgraph.checkpoint.redis.aio import AsyncRedisSaver
+from langgraph.checkpoint.redis.base import REDIS_KEY_SEPARATOR
+from langgraph.checkpoint.redis.util import to_storage_safe_id, to_storage_safe_str
+from utility import update_transcript, TRANSCRIPT_SUMMARIZE
+from agents import summarize_history, asummarize_history
+from metrics import HOT_STATE_LOOKUPS
+
+REDIS_URI = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "50"))
+# Checkpoint keys of a thread expire after this many idle minutes (reads refresh the TTL); 0 disables expiry
+CHECKPOINT_TTL_MINUTES = float(os.getenv("CHECKPOINT_TTL_MINUTES", "1440"))
+# Checkpoints kept per thread after each run; older ones, their writes and unreferenced blobs are deleted
+CHECKPOINT_KEEP = int(os.getenv("CHECKPOINT_KEEP", "10"))
+# Seconds between pruning passes over the threads that ran since the previous pass
+CHECKPOINT_PRUNE_INTERVAL = float(os.getenv("CHECKPOINT_PRUNE_INTERVAL", "60"))
+# Upper bound on documents one index lookup returns, as in RedisSaver
+PRUNE_QUERY_LIMIT = 10000
+# Latest checkpoint of this many recently active threads kept deserialized in process; 0 disables the cache
+HOT_STATE_THREADS = int(os.getenv("HOT_STATE_THREADS", "256"))
+# Seconds an idle thread's state stays cached; must stay far below CHECKPOINT_TTL_MINUTES
+HOT_STATE_TTL = float(os.getenv("HOT_STATE_TTL", "600"))
+HOT_STATE_VERSION_PREFIX = "hot_state_version"
+
+
+def _ttl_config():
+    if CHECKPOINT_TTL_MINUTES <= 0:
+        return None
+    return {"default_ttl": CHECKPOINT_TTL_MINUTES, "refresh_on_read": True}
+
+@contextmanager
+def get_memory():
+    pool = redis.ConnectionPool.from_url(REDIS_URI, max_connections=REDIS_MAX_CONNECTIONS)
+    client = redis.Redis(connection_pool=pool)
+    try:
+        saver = RedisSaver(redis_client=client, ttl=_ttl_config())
+        saver.setup()
+        yield HotStateSaver(saver, client) if HOT_STATE_THREADS > 0 else saver
+    finally:
+        client.close()
+        pool.disconnect()
+
+@asynccontextmanager
+async def get_async_memory():
+    # AsyncRedisSaver binds to the running loop, so it has to be opened from inside it
+    pool = aredis.ConnectionPool.from_url(REDIS_URI, max_connections=REDIS_MAX_CONNECTIONS)
+    client = aredis.Redis(connection_pool=pool)
+    try:
+        saver = AsyncRedisSaver(redis_client=client, ttl=_ttl_config())
+        await saver.asetup()
+        yield HotStateSaver(saver, client) if HOT_STATE_THREADS > 0 else saver
+    finally:
+        await client.aclose()
+        await pool.disconnect()
+
+
+def _copy_checkpoint(checkpoint):
+    # The loop updates channel_versions/versions_seen in place and appends to list channels
+    checkpoint = copy_checkpoint(checkpoint)
+    checkpoint["channel_values"] = {
+        channel: value.copy() if isinstance(value, (list, dict)) else value
+        for channel, value in checkpoint["channel_values"].items()
+    }
+    return checkpoint
+
+def _add_writes(pending_writes, writes, task_id):
+    """pending_writes with `writes` applied the way the savers store them: special channels replace, others never do."""
+    by_key = {}
+    for index, (write_task_id, channel, value) in enumerate(pending_writes):
+        by_key[(write_task_id, WRITES_IDX_MAP.get(channel, index))] = (write_task_id, channel, value)
+    for idx, (channel, value) in enumerate(writes):
+        key = (task_id, WRITES_IDX_MAP.get(channel, idx))
+        if key[1] >= 0 and key in by_key:
+            continue
+        by_key[key] = (task_id, channel, value)
+    return list(by_key.values())
+
+
+class _HotThread:
+    """Latest checkpoint of one thread as the wrapped saver would return it, plus the writes per checkpoint id."""
+
+    # Writes of the latest few checkpoint ids; the loop can store a step's writes before its checkpoint
+    KEEP_WRITE_IDS = 4
+
+    def __init__(self, version, saved):
+        self.version = version
+        self.saved = saved._replace(pending_writes=None) if saved is not None else None
+        self.writes = {saved.config["configurable"]["checkpoint_id"]: list(saved.pending_writes or [])} if saved is not None else {}
+
+    def add_writes(self, checkpoint_id, writes, task_id):
+        self.writes[checkpoint_id] = _add_writes(self.writes.pop(checkpoint_id, []), writes, task_id)
+        while len(self.writes) > self.KEEP_WRITE_IDS:
+            del self.writes[next(iter(self.writes))]
+
+    def snapshot(self):
+        if self.saved is None:
+            return None
+        checkpoint_id = self.saved.config["configurable"]["checkpoint_id"]
+        return CheckpointTuple(
+            config={**self.saved.config, "configurable": dict(self.saved.config["configurable"])},
+            checkpoint=_copy_checkpoint(self.saved.checkpoint),
+            metadata=dict(self.saved.metadata),
+            parent_config=self.saved.parent_config,
+            pending_writes=list(self.writes.get(checkpoint_id, [])),
+        )
+
+
+class HotStateSaver(BaseCheckpointSaver):
+    """Write-through LRU cache of each recently active thread's latest checkpoint, over another saver.
+
+    Every put/put_writes also increments a per-thread version counter in Redis. A cached state is
+    served only while that counter still equals the newest version this process wrote or read,
+    so a write from another worker costs one GET to notice instead of serving stale state. This
+    relies on runs of a thread being serialized by its lease (runs.py): only the process holding
+    it writes, so its own writes may be applied in any order. Reads of a specific checkpoint_id
+    and list() go straight to the wrapped saver.
+    """
+
+    def __init__(self, saver, client, maxsize=HOT_STATE_THREADS, ttl=HOT_STATE_TTL):
+        super().__init__(serde=saver.serde)
+        self.saver = saver
+        self.client = client
+        # Entries must expire well before the version counter can, or a re-created counter could match an old entry
+        self._threads = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        self._version_ttl_ms = int(CHECKPOINT_TTL_MINUTES * 60_000) if CHECKPOINT_TTL_MINUTES > 0 else None
+
+    def __getattr__(self, name):
+        # Pruning and tooling reach into the wrapped saver (e.g. its _redis client)
+        if name == "saver":
+            raise AttributeError(name)
+        return getattr(self.saver, name)
+
+    @property
+    def config_specs(self):
+        return self.saver.config_specs
+
+    def get_next_version(self, current, channel):
+        return self.saver.get_next_version(current, channel)
+
+    def _thread_key(self, config):
+        configurable = config["configurable"]
+        return configurable["thread_id"], configurable.get("checkpoint_ns", "")
+
+    def _version_key(self, thread_key):
+        thread_id, checkpoint_ns = thread_key
+        return _key(HOT_STATE_VERSION_PREFIX, str(to_storage_safe_id(thread_id)), to_storage_safe_str(checkpoint_ns))
+
+    def _bump(self, thread_key):
+        pipeline = self.client.pipeline(transaction=False)
+        pipeline.incr(self._version_key(thread_key))
+        if self._version_ttl_ms:
+            pipeline.pexpire(self._version_key(thread_key), self._version_ttl_ms)
+        return pipeline
+
+    def _cached(self, thread_key, version):
+        with self._lock:
+            hot = self._threads.get(thread_key)
+            if hot is not None and hot.version == int(version or 0):
+                HOT_STATE_LOOKUPS.inc(outcome="hit")
+                return True, hot.snapshot()
+        HOT_STATE_LOOKUPS.inc(outcome="miss" if hot is None else "stale")
+        return False, None
+
+    def _loaded(self, thread_key, version, saved):
+        with self._lock:
+            if version is None and saved is not None:
+                # The counter expired while the checkpoints lived on; nothing to compare against
+                self._threads.pop(thread_key, None)
+            else:
+                self._threads[thread_key] = _HotThread(int(version or 0), saved)
+
+    def _written(self, thread_key, version, update):
+        with self._lock:
+            hot = self._threads.get(thread_key)
+            if hot is None:
+                # Not read through this process, so earlier writes may be missing; the next read loads it
+                return
+            update(hot)
+            hot.version = max(hot.version, version)
+            self._threads[thread_key] = hot
+
+    def _put_update(self, config, checkpoint, metadata, next_config):
+        saved = CheckpointTuple(next_config, _copy_checkpoint(checkpoint), dict(metadata), config if get_checkpoint_id(config) else None, None)
+
+        def update(hot):
+            hot.saved = saved
+        return update
+
+    def _writes_update(self, config, writes, task_id):
+        def update(hot):
+            hot.add_writes(get_checkpoint_id(config), writes, task_id)
+        return update
+
+    def get_tuple(self, config):
+        if get_checkpoint_id(config):
+            return self.saver.get_tuple(config)
+        thread_key = self._thread_key(config)
+        version = self.client.get(self._version_key(thread_key))
+        hit, saved = self._cached(thread_key, version)
+        if hit:
+            return saved
+        saved = self.saver.get_tuple(config)
+        self._loaded(thread_key, version, saved)
+        return saved
+
+    async def aget_tuple(self, config):
+        if get_checkpoint_id(config):
+            return await self.saver.aget_tuple(config)
+        thread_key = self._thread_key(config)
+        version = await self.client.get(self._version_key(thread_key))
+        hit, saved = self._cached(thread_key, version)
+        if hit:
+            return saved
+        saved = await self.saver.aget_tuple(config)
+        self._loaded(thread_key, version, saved)
+        return saved
+
+    def list(self, config, *, filter=None, before=None, limit=None):
+        return self.saver.list(config, filter=filter, before=before, limit=limit)
+
+    def alist(self, config, *, filter=None, before=None, limit=None):
+        return self.saver.alist(config, filter=filter, before=before, limit=limit)
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        next_config = self.saver.put(config, checkpoint, metadata, new_versions)
+        thread_key = self._thread_key(config)
+        version = self._bump(thread_key).execute()[0]
+        self._written(thread_key, version, self._put_update(config, checkpoint, metadata, next_config))
+        return next_config
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        next_config = await self.saver.aput(config, checkpoint, metadata, new_versions)
+        thread_key = self._thread_key(config)
+        version = (await self._bump(thread_key).execute())[0]
+        self._written(thread_key, version, self._put_update(config, checkpoint, metadata, next_config))
+        return next_config
+
+    def put_writes(self, config, writes, task_id, task_path=""):
+        self.saver.put_writes(config, writes, task_id, task_path)
+        thread_key = self._thread_key(config)
+        version = self._bump(thread_key).execute()[0]
+        self._written(thread_key, version, self._writes_update(config, writes, task_id))
+
+    async def aput_writes(self, config, writes, task_id, task_path=""):
+        await self.saver.aput_writes(config, writes, task_id, task_path)
+        thread_key = self._thread_key(config)
+        version = (await self._bump(thread_key).execute())[0]
+        self._written(thread_key, version, self._writes_update(config, writes, task_id))
+
+    def _forget(self, thread_id):
+        with self._lock:
+            for thread_key in [key for key in self._threads if key[0] == thread_id]:
+                self._threads.pop(thread_key, None)
+
+    def delete_thread(self, thread_id):
+        self.saver.delete_thread(thread_id)
+        self._forget(thread_id)
+        self._bump((thread_id, "")).execute()
+
+    async def adelete_thread(self, thread_id):
+        await self.saver.adelete_thread(thread_id)
+        self._forget(thread_id)
+        await self._bump((thread_id, "")).execute()
+
+
+def _key(*parts):
+    return REDIS_KEY_SEPARATOR.join(parts)
+
+def _stale_blobs(blob_docs, documents):
+    """Keys of the blobs whose (channel, version) no retained checkpoint references."""
+    retained = set()
+    for document in documents:
+        channel_versions = document[0] if isinstance(document, list) and document else document
+        for channel, version in (channel_versions or {}).items():
+            retained.add((channel, str(version)))
+    return [doc.id for doc in blob_docs if (doc.channel, doc.version) not in retained]
+
+def _thread_filter(thread_id, checkpoint_ns):
+    return (Tag("thread_id") == to_storage_safe_id(thread_id)) & (Tag("checkpoint_ns") == to_storage_safe_str(checkpoint_ns))
+
+def _prune_queries(thread_id, checkpoint_ns):
+    # Looked up through the saver's RediSearch indexes like RedisSaver does: a SCAN walks every key in Redis
+    thread = _thread_filter(thread_id, checkpoint_ns)
+    blobs = FilterQuery(filter_expression=thread, return_fields=["channel", "version"], num_results=PRUNE_QUERY_LIMIT)
+    checkpoints = FilterQuery(filter_expression=thread, return_fields=["checkpoint_id"], num_results=PRUNE_QUERY_LIMIT)
+    return blobs, checkpoints
+
+def _writes_query(thread_id, checkpoint_ns, checkpoint_docs):
+    checkpoint_ids = [doc.checkpoint_id for doc in checkpoint_docs]
+    return FilterQuery(
+        filter_expression=_thread_filter(thread_id, checkpoint_ns) & (Tag("checkpoint_id") == checkpoint_ids),
+        return_fields=["checkpoint_id"],
+        num_results=PRUNE_QUERY_LIMIT,
+    )
+
+def _newest_first(docs):
+    # Checkpoint ids are uuid6, so lexical order is creation order
+    return sorted(docs, key=lambda doc: doc.checkpoint_id, reverse=True)
+
+def prune_thread(saver, thread_id, keep=CHECKPOINT_KEEP, checkpoint_ns=""):
+    """Keep only the newest `keep` checkpoints of a thread. Returns how many were deleted."""
+    blobs_query, checkpoints_query = _prune_queries(thread_id, checkpoint_ns)
+    # Blobs are listed before checkpoints: every blob seen here belongs to a checkpoint listed below,
+    # so a run writing concurrently can never lose a blob of its newest checkpoint
+    blob_docs = saver.checkpoint_blobs_index.search(blobs_query).docs
+    checkpoint_docs = _newest_first(saver.checkpoints_index.search(checkpoints_query).docs)
+    if len(checkpoint_docs) <= keep:
+        return 0
+    kept, dropped = checkpoint_docs[:keep], checkpoint_docs[keep:]
+    documents = saver._redis.json().mget([doc.id for doc in kept], "$.checkpoint.channel_versions")
+    write_docs = saver.checkpoint_writes_index.search(_writes_query(thread_id, checkpoint_ns, dropped)).docs
+
+    doomed = [doc.id for doc in dropped] + _stale_blobs(blob_docs, documents) + [doc.id for doc in write_docs]
+    saver._redis.delete(*doomed)
+    return len(dropped)
+
+async def aprune_thread(saver, thread_id, keep=CHECKPOINT_KEEP, checkpoint_ns=""):
+    blobs_query, checkpoints_query = _prune_queries(thread_id, checkpoint_ns)
+    blob_docs = (await saver.checkpoint_blobs_index.search(blobs_query)).docs
+    checkpoint_docs = _newest_first((await saver.checkpoints_index.search(checkpoints_query)).docs)
+    if len(checkpoint_docs) <= keep:
+        return 0
+    kept, dropped = checkpoint_docs[:keep], checkpoint_docs[keep:]
+    documents = await saver._redis.json().mget([doc.id for doc in kept], "$.checkpoint.channel_versions")
+    write_docs = (await saver.checkpoint_writes_index.search(_writes_query(thread_id, checkpoint_ns, dropped))).docs
+
+    doomed = [doc.id for doc in dropped] + _stale_blobs(blob_docs, documents) + [doc.id for doc in write_docs]
+    await saver._redis.delete(*doomed)
+    return len(dropped)
+
+
+class ThreadBusyError(Exception):
+    """The thread is paused at an interrupt or still running, so its history cannot be rewritten."""
+
+def _compaction_update(values, keep_messages):
+    # Render everything not yet in the transcript before those messages disappear
+    update, evicted = update_transcript(values)
+    messages = values["messages"]
+    drop = messages[:max(len(messages) - max(keep_messages, 1), 0)]
+    update["messages"] = [RemoveMessage(id=message.id) for message in drop]
+    update["transcript_cursor"] = len(messages) - len(drop)
+    return update, evicted, len(drop)
+
+def compact_thread(app, thread_id, keep_messages=4):
+    """Drop all but the last `keep_messages` messages of a finished thread; the transcript keeps their rendered form."""
+    config = {"configurable": {"thread_id": thread_id}}
+    snapshot = app.get_state(config)
+    if snapshot.next or snapshot.interrupts:
+        raise ThreadBusyError(thread_id)
+    if not snapshot.values.get("messages"):
+        return 0
+    update, evicted, dropped = _compaction_update(snapshot.values, keep_messages)
+    if evicted and TRANSCRIPT_SUMMARIZE:
+        update["transcript_summary"] = summarize_history(snapshot.values.get("transcript_summary", ""), evicted)
+    if dropped:
+        app.update_state(config, update)
+    return dropped
+
+async def acompact_thread(app, thread_id, keep_messages=4):
+    config = {"configurable": {"thread_id": thread_id}}
+    snapshot = await app.aget_state(config)
+    if snapshot.next or snapshot.interrupts:
+        raise ThreadBusyError(thread_id)
+    if not snapshot.values.get("messages"):
+        return 0
+    update, evicted, dropped = _compaction_update(snapshot.values, keep_messages)
+    if evicted and TRANSCRIPT_SUMMARIZE:
+        update["transcript_summary"] = await asummarize_history(snapshot.values.get("transcript_summary", ""), evicted)
+    if dropped:
+        await app.aupdate_state(config, update)
+    return dropped
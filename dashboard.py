@@ -0,0 +1,230 @@
+import os
+import time
+import asyncio
+import weakref
+import threading
+import httpx
+from cachetools import TTLCache
+from metrics import DASHBOARD_SECONDS
+
+DASHBOARD_URL = os.getenv("DASHBOARD_API_URL", "http://localhost:3000/api/boxes")
+DASHBOARD_TIMEOUT = float(os.getenv("DASHBOARD_TIMEOUT", "5"))
+COLLECTION_CACHE_SIZE = int(os.getenv("COLLECTION_CACHE_SIZE", "256"))
+COLLECTION_CACHE_TTL = float(os.getenv("COLLECTION_CACHE_TTL", "30"))
+
+# Only these verbs are safe to send twice; a retried POST could create the collection twice
+IDEMPOTENT_METHODS = {"GET", "PUT", "DELETE"}
+RETRY_STATUSES = {502, 503, 504}
+
+
+class DashboardClient:
+    """Keep-alive pooled client for the dashboard `/api/boxes` API, with sync and async interfaces."""
+
+    def __init__(self, base_url=DASHBOARD_URL, timeout=DASHBOARD_TIMEOUT, retries=2, backoff=0.2, max_connections=20):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        self._client = None
+        # httpx.AsyncClient pools are tied to the loop that created them
+        self._async_clients = weakref.WeakKeyDictionary()
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = httpx.Client(timeout=self.timeout, limits=self.limits)
+        return self._client
+
+    @property
+    def async_client(self):
+        loop = asyncio.get_running_loop()
+        if loop not in self._async_clients:
+            self._async_clients[loop] = httpx.AsyncClient(timeout=self.timeout, limits=self.limits)
+        return self._async_clients[loop]
+
+    def _should_retry(self, method, attempt, response=None, error=None):
+        if method not in IDEMPOTENT_METHODS or attempt >= self.retries:
+            return False
+        if error is not None:
+            return isinstance(error, httpx.TransportError)
+        return response.status_code in RETRY_STATUSES
+
+    def request(self, method, timeout=None, **kwargs):
+        method = method.upper()
+        attempt = 0
+        while True:
+            start = time.perf_counter()
+            try:
+                response = self.client.request(method, self.base_url, timeout=timeout or self.timeout, **kwargs)
+            except Exception as e:
+                DASHBOARD_SECONDS.observe(time.perf_counter() - start, method=method, status="error")
+                if not self._should_retry(method, attempt, error=e):
+                    raise
+            else:
+                DASHBOARD_SECONDS.observe(time.perf_counter() - start, method=method, status=response.status_code)
+                if not self._should_retry(method, attempt, response=response):
+                    return response
+            time.sleep(self.backoff * 2 ** attempt)
+            attempt += 1
+
+    async def arequest(self, method, timeout=None, **kwargs):
+        method = method.upper()
+        attempt = 0
+        while True:
+            start = time.perf_counter()
+            try:
+                response = await self.async_client.request(method, self.base_url, timeout=timeout or self.timeout, **kwargs)
+            except Exception as e:
+                DASHBOARD_SECONDS.observe(time.perf_counter() - start, method=method, status="error")
+                if not self._should_retry(method, attempt, error=e):
+                    raise
+            else:
+                DASHBOARD_SECONDS.observe(time.perf_counter() - start, method=method, status=response.status_code)
+                if not self._should_retry(method, attempt, response=response):
+                    return response
+            await asyncio.sleep(self.backoff * 2 ** attempt)
+            attempt += 1
+
+    def get(self, **kwargs):
+        return self.request("GET", **kwargs)
+
+    def post(self, **kwargs):
+        return self.request("POST", **kwargs)
+
+    def put(self, **kwargs):
+        return self.request("PUT", **kwargs)
+
+    def delete(self, **kwargs):
+        return self.request("DELETE", **kwargs)
+
+    async def aget(self, **kwargs):
+        return await self.arequest("GET", **kwargs)
+
+    async def apost(self, **kwargs):
+        return await self.arequest("POST", **kwargs)
+
+    async def aput(self, **kwargs):
+        return await self.arequest("PUT", **kwargs)
+
+    async def adelete(self, **kwargs):
+        return await self.arequest("DELETE", **kwargs)
+
+    def close(self):
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+    async def aclose(self):
+        self.close()
+        for client in list(self._async_clients.values()):
+            await client.aclose()
+        self._async_clients.clear()
+
+
+class CollectionCache:
+    """Process-wide LRU/TTL cache for collection list and by-name lookups.
+
+    Writes call invalidate_*(); a load that started before an invalidation is not stored,
+    so a slow read can never put back data that a concurrent write already replaced.
+    version(key) changes whenever a write may have changed what `key` reads, so a result held
+    outside the cache (a speculative prefetch) can be checked before it is used.
+    """
+
+    ALL = ("all",)
+
+    def __init__(self, maxsize=COLLECTION_CACHE_SIZE, ttl=COLLECTION_CACHE_TTL):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._names_by_id = {}
+        self._lock = threading.Lock()
+        self._generation = 0
+        # Per-key write counters; _epoch moves every key at once when a write cannot be attributed
+        self._versions = {}
+        self._epoch = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _get(self, key):
+        with self._lock:
+            value = self._cache.get(key)
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return value, self._generation
+
+    def _put(self, key, value, generation):
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._cache[key] = value
+            boxes = value if isinstance(value, list) else [value]
+            for box in boxes:
+                if isinstance(box, dict) and "id" in box and "name" in box:
+                    self._names_by_id[str(box["id"])] = box["name"]
+
+    def version(self, key):
+        with self._lock:
+            return self._epoch, self._versions.get(key, 0)
+
+    def _bump(self, *keys):
+        for key in keys:
+            self._versions[key] = self._versions.get(key, 0) + 1
+
+    def get_all(self):
+        return self._get(self.ALL)
+
+    def put_all(self, boxes, generation):
+        self._put(self.ALL, boxes, generation)
+
+    def get_by_name(self, name):
+        return self._get(("name", name))
+
+    def put_by_name(self, name, box, generation):
+        self._put(("name", name), box, generation)
+
+    def invalidate_name(self, name):
+        with self._lock:
+            self._generation += 1
+            self._cache.pop(self.ALL, None)
+            self._bump(self.ALL)
+            if name is not None:
+                self._cache.pop(("name", name), None)
+                self._bump(("name", name))
+
+    def invalidate_id(self, id, new_name=None):
+        with self._lock:
+            self._generation += 1
+            self._cache.pop(self.ALL, None)
+            self._bump(self.ALL)
+            old_name = self._names_by_id.pop(str(id), None)
+            if old_name is None:
+                # The collection was never read through the cache, so any name may have changed
+                self._epoch += 1
+            for name in (old_name, new_name):
+                if name is not None:
+                    self._cache.pop(("name", name), None)
+                    self._bump(("name", name))
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._epoch += 1
+            self._cache.clear()
+            self._names_by_id.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "size": len(self._cache),
+                "maxsize": self._cache.maxsize,
+                "ttl": self._cache.ttl,
+            }
+
+
+dashboard = DashboardClient()
+collection_cache = CollectionCache()
@@ -1,18 +1,36 @@
-from langgraph.prebuilt import ToolNode
 from langgraph.graph import MessagesState, START, END, StateGraph
-from langgraph.checkpoint.redis import RedisSaver
-from IPython.display import Image, display
-from langchain_core.messages import ToolMessage
+from langgraph.utils.runnable import RunnableCallable
+from langchain_core.messages import ToolMessage, AIMessage
 from langgraph.types import interrupt, Command
-from tools import create_data_collection, get_all_data_collection, get_collection_by_name, update_data_collection, delete_data_collection, talk_to_human, BasicToolNode
-from utility import filter_history
-from agents import get_main_agent, get_planner, get_replanner, Response
+from tools import create_data_collection, get_all_data_collection, get_collection_by_name, update_data_collection, delete_data_collection, talk_to_human, create_data_collections_batch, update_data_collections_batch, delete_data_collections_batch, BasicToolNode, tool_succeeded, runnable_tool_calls
+from plan_cache import plan_cache, PLAN_CACHE_ENABLED
+from utility import update_transcript, render_transcript, TRANSCRIPT_SUMMARIZE
+from agents import get_main_agent, aget_main_agent, get_planner, get_replanner, aget_replanner, get_cursor_replanner, aget_cursor_replanner, get_fused_agent, aget_fused_agent, summarize_history, asummarize_history, Response
+from contextlib import ExitStack
+from checkpoints import get_memory
+from metrics import graph_metrics
+from tracing import log_sampled
+import atexit
 import json
+import os
+
+# 'replanner': every step goes through the replanner LLM (original behaviour).
+# 'cursor': successful steps advance through `plan` directly; the replanner only handles failures, rejections and user feedback.
+EXECUTION_MODE = os.getenv("AGENT_EXECUTION_MODE", "replanner")
+# 'plan_execute': replanner instruction + agent tool call per step (two LLM calls).
+# 'fused': one call per step returns either the next tool call or the final Response.
+TOPOLOGY = os.getenv("AGENT_TOPOLOGY", "plan_execute")
 
 class DataCollectionState(MessagesState):
     task: str
     plan: list
     current_instruction: str
+    # Rolling, token-budgeted render of `messages`; only messages after transcript_cursor are re-rendered
+    transcript: list
+    transcript_cursor: int
+    transcript_summary: str
+    # Index into `plan` of the step being executed in cursor mode, -1 for an off-plan step from the replanner
+    plan_cursor: int
 
 create_data_collection_tool = BasicToolNode([create_data_collection])
 get_all_data_collection_tool = BasicToolNode([get_all_data_collection])
@@ -20,30 +38,120 @@ get_collection_by_name_tool = BasicToolNode([get_collection_by_name])
 update_data_collection_tool = BasicToolNode([update_data_collection])
 delete_data_collection_tool = BasicToolNode([delete_data_collection])
 talk_to_human_tool = BasicToolNode([talk_to_human])
+create_data_collections_batch_tool = BasicToolNode([create_data_collections_batch])
+update_data_collections_batch_tool = BasicToolNode([update_data_collections_batch])
+delete_data_collections_batch_tool = BasicToolNode([delete_data_collections_batch])
+# Several read-only calls from one AIMessage, run concurrently
+read_tools = BasicToolNode([get_all_data_collection, get_collection_by_name])
+
+# Checkpointer for callers of build_graph() that do not manage one themselves; closed at exit
+_memory_stack = ExitStack()
+atexit.register(_memory_stack.close)
 
-def get_memory():
-    REDIS_URI = "redis://localhost:6379/0"
-    memory = None
-    with RedisSaver.from_conn_string(REDIS_URI) as cp:
-        cp.setup()
-    memory = cp
-    return memory
+def _cached_plan(task):
+    return plan_cache.lookup(task) if PLAN_CACHE_ENABLED else None
+
+def _plan_update(task, steps, cached):
+    if not cached and PLAN_CACHE_ENABLED:
+        plan_cache.store(task, steps)
+    log_sampled(f"plan{' (cached)' if cached else ''}", '\n'.join(steps))
+    return {"plan": steps, 'current_instruction': steps[0], 'plan_cursor': 0}
 
 def run_planner(state):
+    steps = _cached_plan(state["task"])
+    if steps is not None:
+        return _plan_update(state["task"], steps, cached=True)
     planner = get_planner()
     plan = planner.invoke({"messages": [("user", state["task"])]})          
-    plan_str = '\n'.join(plan.steps)
-    print(f"main plan >>>>>>>>>>>>>>>>>>>>>>>>>>>>>>> {plan_str}")      
-    return {"plan": plan.steps, 'current_instruction': plan.steps[0]}
+    return _plan_update(state["task"], plan.steps, cached=False)
+
+async def arun_planner(state):
+    steps = _cached_plan(state["task"])
+    if steps is not None:
+        return _plan_update(state["task"], steps, cached=True)
+    planner = get_planner()
+    plan = await planner.ainvoke({"messages": [("user", state["task"])]})
+    return _plan_update(state["task"], plan.steps, cached=False)
+
+def _history(state, update):
+    return render_transcript(update['transcript'], update.get('transcript_summary', state.get('transcript_summary', '')))
+
+def get_transcript(state):
+    update, evicted = update_transcript(state)
+    if evicted and TRANSCRIPT_SUMMARIZE:
+        update['transcript_summary'] = summarize_history(state.get('transcript_summary', ''), evicted)
+    return update
+
+async def aget_transcript(state):
+    update, evicted = update_transcript(state)
+    if evicted and TRANSCRIPT_SUMMARIZE:
+        update['transcript_summary'] = await asummarize_history(state.get('transcript_summary', ''), evicted)
+    return update
+
+# Only the cursor mode tracks which plan step is running; the replanner and fused nodes pick
+# any instruction, so they clear the position and readers such as prefetch consider the whole plan
+OFF_CURSOR = {'plan_cursor': -1}
 
 def run_replanner(state):
-    message_Str, message_list = filter_history(state['messages'])
-    replanner = get_replanner(state['task'], state['plan'], message_Str)
-    return replanner
+    transcript = get_transcript(state)
+    replanner = get_replanner(state['task'], state['plan'], _history(state, transcript))
+    return {**replanner, **transcript, **OFF_CURSOR}
+
+async def arun_replanner(state):
+    transcript = await aget_transcript(state)
+    replanner = await aget_replanner(state['task'], state['plan'], _history(state, transcript))
+    return {**replanner, **transcript, **OFF_CURSOR}
+
+def run_cursor_replanner(state):
+    transcript = get_transcript(state)
+    replanner = get_cursor_replanner(state['task'], state['plan'], _history(state, transcript))
+    return {**replanner, **transcript}
+
+async def arun_cursor_replanner(state):
+    transcript = await aget_transcript(state)
+    replanner = await aget_cursor_replanner(state['task'], state['plan'], _history(state, transcript))
+    return {**replanner, **transcript}
+
+def run_fused_agent(state):
+    transcript = get_transcript(state)
+    agent = get_fused_agent(state['task'], state['plan'], _history(state, transcript))
+    return {**agent, **transcript, **OFF_CURSOR}
+
+async def arun_fused_agent(state):
+    transcript = await aget_transcript(state)
+    agent = await aget_fused_agent(state['task'], state['plan'], _history(state, transcript))
+    return {**agent, **transcript, **OFF_CURSOR}
+
+def advance_plan(state):
+    cursor = state.get('plan_cursor', -1)
+    results = []
+    for message in reversed(state['messages']):
+        if isinstance(message, AIMessage):
+            break
+        results.append(message)
+    if cursor < 0 or not results or not all(tool_succeeded(message) for message in results):
+        return Command(goto="replanner")
+    cursor += 1
+    if cursor >= len(state['plan']):
+        return Command(update={'plan_cursor': cursor, 'current_instruction': 'END'}, goto=END)
+    return Command(update={'plan_cursor': cursor, 'current_instruction': state['plan'][cursor]}, goto="agent")
 
 def run_agent(state):           
-    message_Str, message_list = filter_history(state['messages'])
-    return get_main_agent(state['current_instruction'], message_Str)  
+    transcript = get_transcript(state)
+    agent = get_main_agent(state['current_instruction'], _history(state, transcript))
+    return {**agent, **transcript}
+
+async def arun_agent(state):
+    transcript = await aget_transcript(state)
+    agent = await aget_main_agent(state['current_instruction'], _history(state, transcript))
+    return {**agent, **transcript}
+
+def _node(func, afunc):
+    # Nodes carry both implementations so the same graph can be driven by stream() or astream()
+    return RunnableCallable(func, afunc, name=func.__name__)
+
+def _tool_node(tool_node, name=None):
+    return RunnableCallable(tool_node, tool_node.acall, name=name or next(iter(tool_node.tools_by_name)))
 
 def should_continue(state):
     messages = state["messages"]
@@ -51,6 +159,8 @@ def should_continue(state):
 
     if not last_message.tool_calls:
         return 'replanner'
+    elif len(runnable_tool_calls(last_message.tool_calls)) > 1:
+        return "read_tools"
     elif last_message.tool_calls[0]["name"] == "create_data_collection":
         return "create_data_collection_tool"
     elif last_message.tool_calls[0]["name"] == "get_all_data_collections":
@@ -63,41 +173,87 @@ def should_continue(state):
         return "delete_data_collection_tool"
     elif last_message.tool_calls[0]["name"] == "talk_to_human":
         return "talk_to_human_tool"
+    elif last_message.tool_calls[0]["name"] == "create_data_collections_batch":
+        return "create_data_collections_batch_tool"
+    elif last_message.tool_calls[0]["name"] == "update_data_collections_batch":
+        return "update_data_collections_batch_tool"
+    elif last_message.tool_calls[0]["name"] == "delete_data_collections_batch":
+        return "delete_data_collections_batch_tool"
     
+def should_continue_fused(state):
+    if state['current_instruction'] == 'END' or not state["messages"][-1].tool_calls:
+        return END
+    return should_continue(state)
+
 def should_end(state: DataCollectionState):
     if state['current_instruction'] == 'END':
         return END
     else:
         return "agent"
 
-def build_graph():
+TOOL_NODES = ["create_data_collection_tool", "get_all_data_collection_tool", "get_collection_by_name_tool", "update_data_collection_tool", "delete_data_collection_tool", "talk_to_human_tool", "create_data_collections_batch_tool", "update_data_collections_batch_tool", "delete_data_collections_batch_tool", "read_tools"]
+
+def _add_tool_nodes(workflow):
+    workflow.add_node("create_data_collection_tool", _tool_node(create_data_collection_tool))
+    workflow.add_node("get_all_data_collection_tool", _tool_node(get_all_data_collection_tool))
+    workflow.add_node("get_collection_by_name_tool", _tool_node(get_collection_by_name_tool))
+    workflow.add_node("update_data_collection_tool", _tool_node(update_data_collection_tool))
+    workflow.add_node("delete_data_collection_tool", _tool_node(delete_data_collection_tool))
+    workflow.add_node("talk_to_human_tool", _tool_node(talk_to_human_tool))
+    workflow.add_node("create_data_collections_batch_tool", _tool_node(create_data_collections_batch_tool))
+    workflow.add_node("update_data_collections_batch_tool", _tool_node(update_data_collections_batch_tool))
+    workflow.add_node("delete_data_collections_batch_tool", _tool_node(delete_data_collections_batch_tool))
+    workflow.add_node("read_tools", _tool_node(read_tools, name="read_tools"))
+
+def build_plan_execute_workflow(execution_mode):
+    after_tool = "advance" if execution_mode == "cursor" else "replanner"
+
     workflow = StateGraph(DataCollectionState)
 
-    workflow.add_node("planner", run_planner)
-    workflow.add_node("agent", run_agent)
-    workflow.add_node("create_data_collection_tool", create_data_collection_tool)
-    workflow.add_node("get_all_data_collection_tool", get_all_data_collection_tool)
-    workflow.add_node("get_collection_by_name_tool", get_collection_by_name_tool)
-    workflow.add_node("update_data_collection_tool", update_data_collection_tool)
-    workflow.add_node("delete_data_collection_tool", delete_data_collection_tool)
-    workflow.add_node("talk_to_human_tool", talk_to_human_tool)
-    workflow.add_node("replanner", run_replanner)
+    workflow.add_node("planner", _node(run_planner, arun_planner))
+    workflow.add_node("agent", _node(run_agent, arun_agent))
+    _add_tool_nodes(workflow)
+    if execution_mode == "cursor":
+        workflow.add_node("advance", advance_plan, destinations=("agent", "replanner", END))
+        workflow.add_node("replanner", _node(run_cursor_replanner, arun_cursor_replanner))
+    else:
+        workflow.add_node("replanner", _node(run_replanner, arun_replanner))
 
     workflow.add_edge(START, "planner")
     workflow.add_edge("planner", "agent")
-    workflow.add_conditional_edges("agent", should_continue, path_map=["create_data_collection_tool", "get_all_data_collection_tool", "get_collection_by_name_tool", "update_data_collection_tool", "delete_data_collection_tool", "talk_to_human_tool", "replanner"])
-    workflow.add_edge("create_data_collection_tool", "replanner")
-    workflow.add_edge("get_all_data_collection_tool", "replanner")
-    workflow.add_edge("get_collection_by_name_tool", "replanner")
-    workflow.add_edge("update_data_collection_tool", "replanner")
-    workflow.add_edge("delete_data_collection_tool", "replanner")
-    workflow.add_edge("talk_to_human_tool", "replanner")
+    workflow.add_conditional_edges("agent", should_continue, path_map=TOOL_NODES + ["replanner"])
+    for tool_node in TOOL_NODES:
+        workflow.add_edge(tool_node, after_tool)
     workflow.add_conditional_edges("replanner", should_end, ["agent", END])
-                                   
+    return workflow
+
+def build_fused_workflow():
+    workflow = StateGraph(DataCollectionState)
+
+    workflow.add_node("planner", _node(run_planner, arun_planner))
+    workflow.add_node("agent", _node(run_fused_agent, arun_fused_agent))
+    _add_tool_nodes(workflow)
+
+    workflow.add_edge(START, "planner")
+    workflow.add_edge("planner", "agent")
+    workflow.add_conditional_edges("agent", should_continue_fused, path_map=TOOL_NODES + [END])
+    for tool_node in TOOL_NODES:
+        workflow.add_edge(tool_node, "agent")
+    return workflow
+
+def build_graph(checkpointer=None, execution_mode=None, topology=None):
+    if (topology or TOPOLOGY) == "fused":
+        workflow = build_fused_workflow()
+    else:
+        workflow = build_plan_execute_workflow(execution_mode or EXECUTION_MODE)
 
-    graph = workflow.compile(checkpointer=get_memory())
+    if checkpointer is None:
+        checkpointer = _memory_stack.enter_context(get_memory())
+    # Node, tool and LLM timings for /metrics; merged into the config of every run
+    graph = workflow.compile(checkpointer=checkpointer).with_config(callbacks=[graph_metrics])
 
     # from pathlib import Path
+    # from IPython.display import Image, display
     # display(Image(graph.get_graph().draw_mermaid_png()))
 
     # img_data = graph.get_graph().draw_mermaid_png()
@@ -1,64 +1,260 @@
-from fastapi import FastAPI, Request
+import os
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request, Response, BackgroundTasks, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, JSONResponse
+from starlette.concurrency import iterate_in_threadpool
 from pydantic import BaseModel
-from graph import build_graph
+from graph import build_graph, read_tools
+from tools import compacted_results
+from checkpoints import get_memory, get_async_memory, prune_thread, aprune_thread, compact_thread, acompact_thread, ThreadBusyError, CHECKPOINT_PRUNE_INTERVAL
+from agents import get_registry
 from langgraph.types import interrupt, Command
+from streaming import STREAM_MODES, EventCollector
+from dashboard import dashboard, collection_cache
+from plan_cache import plan_cache
+from metrics import render as render_metrics, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from tracing import logger, new_trace_id, trace_id_var
+from runs import get_thread_runs, fingerprint, ThreadBusy
+from admission import llm_scheduler, llm_priority, LLMOverloaded, RESUME, NEW_THREAD
+from prefetch import read_prefetcher, upcoming_steps, READ_PREFETCH
 
-app = FastAPI()
+# Drive the graph with astream() on an async checkpointer so concurrent threads overlap their waits.
+# Set AGENT_ASYNC_MODE=0 to fall back to the original blocking stream() path.
+ASYNC_MODE = os.getenv("AGENT_ASYNC_MODE", "1") == "1"
+
+workflow_app = None
+memory = None
+thread_runs = None
+# Threads that ran since the last pruning pass
+prune_pending = set()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # The checkpointer and its Redis connection pool live exactly as long as the app
+    global workflow_app, memory, thread_runs
+    get_registry()
+    async with get_thread_runs() as thread_runs:
+        if ASYNC_MODE:
+            async with get_async_memory() as memory:
+                workflow_app = build_graph(checkpointer=memory)
+                compacted_results.client = getattr(memory, "_redis", None)
+                async with periodic_pruning():
+                    yield
+        else:
+            with get_memory() as memory:
+                workflow_app = build_graph(checkpointer=memory)
+                compacted_results.client = getattr(memory, "_redis", None)
+                async with periodic_pruning():
+                    yield
+    await dashboard.aclose()
+
+app = FastAPI(lifespan=lifespan)
 
 # ✅ CORS middleware setup
 app.add_middleware(
-    CORSMiddleware, 
+    CORSMiddleware,
     allow_origins=["*"],  # Replace "*" with specific origin(s) in production
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
 )
 
-workflow_app = build_graph()
-
 class InputPayload(BaseModel):
     query: str
     thread_id: str
     resume_flow: bool = False
     args: dict = {}
 
-@app.post("/run-agent")
-async def run_workflow(input: InputPayload):
-    config = {"configurable": {"thread_id": input.thread_id}}  # Customize if needed    
+def get_graph_input(input: InputPayload):
+    if (input.resume_flow == True):
+        if (input.args == {}):
+            return Command(resume=input.query)
+        return Command(resume=input.args)
 
-    state = {
+    return {
         "messages": [
             ("user", input.query),
         ],
         "task": input.query
     }
 
-    all_messages = []
-    if (input.resume_flow == True):
-        if (input.args == {}):
-            for event in workflow_app.stream(Command(resume=input.query),
-                                    config,
-                                    stream_mode="values"):
-                if ('messages' in event and event['messages'][-1].content != ''):
-                    all_messages.append({'message': event['messages'][-1].content})
-                if ('__interrupt__' in event):  
-                    all_messages.append(event['__interrupt__'][-1].value)
+def run_config(thread_id, resume=False):
+    # One trace id per request, visible in logs, LangChain run metadata and the X-Trace-Id header
+    trace_id = new_trace_id(thread_id)
+    trace_id_var.set(trace_id)
+    # LLM calls of this run queue ahead of new threads when a human is waiting on the resume
+    llm_priority.set(RESUME if resume else NEW_THREAD)
+    return {"configurable": {"thread_id": thread_id}, "metadata": {"trace_id": trace_id}}, trace_id
+
+def collect_event(event, all_messages):
+    if ('messages' in event and event['messages'][-1].content != ''):
+        all_messages.append({'message': event['messages'][-1].content})
+    if ('__interrupt__' in event):
+        all_messages.append(event['__interrupt__'][-1].value)
+
+async def prune_checkpoints(thread_id):
+    try:
+        if ASYNC_MODE:
+            await aprune_thread(memory, thread_id)
+        else:
+            await asyncio.to_thread(prune_thread, memory, thread_id)
+    except Exception as e:
+        logger.warning("checkpoint pruning failed for thread %s: %s", thread_id, e)
+
+async def prune_pass():
+    thread_ids = list(prune_pending)
+    prune_pending.clear()
+    for thread_id in thread_ids:
+        await prune_checkpoints(thread_id)
+
+@asynccontextmanager
+async def periodic_pruning():
+    # Requests only mark their thread; old checkpoints are pruned once per interval, whatever the traffic
+    async def loop():
+        while True:
+            await asyncio.sleep(CHECKPOINT_PRUNE_INTERVAL)
+            await prune_pass()
+
+    task = asyncio.create_task(loop())
+    try:
+        yield
+    finally:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        await prune_pass()
+
+async def prefetch_reads(thread_id, config):
+    # While the run waits on the human, fetch the reads the plan does next; other runs drop what is left
+    if not READ_PREFETCH:
+        return
+    try:
+        state = await workflow_app.aget_state(config) if ASYNC_MODE else workflow_app.get_state(config)
+        if state.interrupts:
+            await read_prefetcher.prefetch(thread_id, upcoming_steps(state.values), read_tools.tools_by_name)
+        else:
+            read_prefetcher.discard(thread_id)
+    except Exception as e:
+        logger.warning("read prefetch failed for thread %s: %s", thread_id, e)
+
+def overloaded_response(error: LLMOverloaded):
+    return JSONResponse({"detail": str(error)}, status_code=503, headers={"Retry-After": str(max(int(error.retry_after), 1))})
+
+def busy_response(busy: ThreadBusy):
+    # 202: the same request is already running, poll for its result. 409: a different request holds the thread.
+    body = {"thread_id": busy.thread_id, "run_id": busy.run_id, "status": "running"}
+    if busy.run_id is not None:
+        body["poll"] = f"/runs/{busy.run_id}"
+    if busy.duplicate:
+        return JSONResponse(body, status_code=202, headers={"Retry-After": "1"})
+    body["detail"] = "Another request is running on this thread"
+    return JSONResponse(body, status_code=409, headers={"Retry-After": "1"})
+
+@app.post("/run-agent")
+async def run_workflow(input: InputPayload, background_tasks: BackgroundTasks, response: Response):
+    config, trace_id = run_config(input.thread_id, input.resume_flow)
+    response.headers["X-Trace-Id"] = trace_id
+
+    try:
+        llm_scheduler.admit(llm_priority.get())
+    except LLMOverloaded as e:
+        return overloaded_response(e)
+
+    graph_input = get_graph_input(input)
+
+    async def execute():
+        all_messages = []
+        if ASYNC_MODE:
+            async for event in workflow_app.astream(graph_input, config, stream_mode="values"):
+                collect_event(event, all_messages)
         else:
-            for event in workflow_app.stream(Command(resume=input.args),
-                                    config,
-                                    stream_mode="values"):
-                if ('messages' in event and event['messages'][-1].content != ''):
-                    all_messages.append({'message': event['messages'][-1].content})
-                if ('__interrupt__' in event):  
-                    all_messages.append(event['__interrupt__'][-1].value)
-                
+            for event in workflow_app.stream(graph_input, config, stream_mode="values"):
+                collect_event(event, all_messages)
+        return all_messages[-1]
+
+    try:
+        result = await thread_runs.run(input.thread_id, fingerprint(input.model_dump()), execute)
+    except ThreadBusy as busy:
+        return busy_response(busy)
+    prune_pending.add(input.thread_id)
+    background_tasks.add_task(prefetch_reads, input.thread_id, config)
+    return result
+
+@app.post("/run-agent/stream")
+async def stream_workflow(input: InputPayload, background_tasks: BackgroundTasks):
+    config, trace_id = run_config(input.thread_id, input.resume_flow)
+
+    try:
+        llm_scheduler.admit(llm_priority.get())
+    except LLMOverloaded as e:
+        return overloaded_response(e)
+
+    graph_input = get_graph_input(input)
+    collector = EventCollector()
+
+    try:
+        lease = await thread_runs.claim(input.thread_id, fingerprint(input.model_dump()))
+    except ThreadBusy as busy:
+        return busy_response(busy)
+
+    if ASYNC_MODE:
+        def chunks():
+            return workflow_app.astream(graph_input, config, stream_mode=STREAM_MODES)
     else:
-        for event in workflow_app.stream(state, config, stream_mode="values"):
-            # print(event)
-            # print('--------------------------------')
-            if ('messages' in event and event['messages'][-1].content != ''):
-                all_messages.append({'message': event['messages'][-1].content})
-            if ('__interrupt__' in event):  
-                all_messages.append(event['__interrupt__'][-1].value)
-    return all_messages[-1]
+        def chunks():
+            return iterate_in_threadpool(workflow_app.stream(graph_input, config, stream_mode=STREAM_MODES))
+
+    async def events():
+        # The lease is held until the stream ends or the client goes away
+        async with thread_runs.hold(lease):
+            async for mode, chunk in chunks():
+                for frame in collector.frames(mode, chunk):
+                    yield frame
+            yield collector.done()
+
+    prune_pending.add(input.thread_id)
+    background_tasks.add_task(prefetch_reads, input.thread_id, config)
+    return StreamingResponse(events(), background=background_tasks, media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", "X-Trace-Id": trace_id, "X-Run-Id": lease.run_id})
+
+@app.get("/metrics")
+async def metrics():
+    return Response(render_metrics(), media_type=METRICS_CONTENT_TYPE)
+
+@app.get("/cache/stats")
+async def cache_stats():
+    return collection_cache.stats()
+
+@app.get("/plan-cache/stats")
+async def plan_cache_stats():
+    return plan_cache.stats()
+
+@app.get("/runs/{run_id}")
+async def get_run(run_id: str):
+    record = await thread_runs.get(run_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired run")
+    return {"run_id": run_id, **record}
+
+@app.get("/threads/{thread_id}/tool-results/{ref}")
+async def get_tool_result(thread_id: str, ref: str):
+    result = await compacted_results.aget(thread_id, ref) if ASYNC_MODE else compacted_results.get(thread_id, ref)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired tool result")
+    return {"thread_id": thread_id, "ref": ref, "result": result}
+
+@app.post("/threads/{thread_id}/compact")
+async def compact_thread_history(thread_id: str, keep_messages: int = 4):
+    async def execute():
+        if ASYNC_MODE:
+            return await acompact_thread(workflow_app, thread_id, keep_messages)
+        return compact_thread(workflow_app, thread_id, keep_messages)
+
+    try:
+        # Under the thread's lease, so a run cannot start while its history is rewritten
+        dropped = await thread_runs.run(thread_id, fingerprint({"compact": keep_messages}), execute)
+    except ThreadBusy as busy:
+        return busy_response(busy)
+    except ThreadBusyError:
+        raise HTTPException(status_code=409, detail="Thread is running or waiting on an interrupt")
+    return {"thread_id": thread_id, "dropped_messages": dropped}
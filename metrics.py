@@ -0,0 +1,211 @@
+import time
+import threading
+from langchain_core.callbacks import BaseCallbackHandler
+
+# Seconds; covers a cached tool lookup up to a slow gpt-4.1 call
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+REGISTRY = []
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    type = None
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels):
+        if set(labels) != set(self.labels):
+            raise ValueError(f"{self.name} expects labels {self.labels}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.extend(self._samples(key, value))
+        return lines
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self, key, value):
+        return [f"{self.name}_total{_format_labels(self.labels, key)} {_format_value(value)}"]
+
+
+class Gauge(_Metric):
+    type = "gauge"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def _samples(self, key, value):
+        return [f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}"]
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            self._values[key] = (counts, total + value)
+
+    def _samples(self, key, value):
+        counts, total = value
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, counts):
+            cumulative += count
+            lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, [('le', _format_value(bound))])} {cumulative}")
+        lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {_format_value(total)}")
+        lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {cumulative}")
+        return lines
+
+
+def render():
+    """All registered metrics in the Prometheus text exposition format (0.0.4)."""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+NODE_SECONDS = Histogram("agent_node_duration_seconds", "Wall time of one graph node run.", ["node", "status"])
+TOOL_SECONDS = Histogram("agent_tool_duration_seconds", "Wall time of one tool call.", ["tool", "status"])
+LLM_SECONDS = Histogram("agent_llm_duration_seconds", "Latency of one chat model call.", ["node", "model", "status"])
+# kind="cached" is the part of kind="prompt" served from the provider's prefix cache; their ratio is the cache hit rate
+LLM_TOKENS = Counter("agent_llm_tokens", "Tokens reported by the chat model.", ["node", "model", "kind"])
+MODEL_TIER_SECONDS = Histogram("agent_model_tier_duration_seconds", "Agent step latency per model tier in cascade mode, admission wait included.", ["tier", "outcome"])
+MODEL_ESCALATIONS = Counter("agent_model_escalations", "Agent steps the small model handed to the large one, by reason.", ["reason"])
+LLM_QUEUE_DEPTH = Gauge("agent_llm_queue_depth", "LLM calls waiting for admission.", ["priority"])
+LLM_QUEUE_SECONDS = Histogram("agent_llm_queue_wait_seconds", "Time an LLM call waited for admission.", ["priority"])
+LLM_REJECTED = Counter("agent_llm_rejected", "Runs turned away because the LLM queue was full.", ["priority"])
+LLM_RATE_LIMITED = Counter("agent_llm_rate_limited", "Provider 429 responses; each pauses admissions for its retry-after.", [])
+LLM_TRANSIENT_ERRORS = Counter("agent_llm_transient_errors", "LLM calls that failed on a connection error, timeout or 5xx.", [])
+PREFETCH_RESULTS = Counter("agent_read_prefetch_results", "Prefetched read results by what became of them on resume.", ["tool", "outcome"])
+HOT_STATE_LOOKUPS = Counter("agent_hot_state_lookups", "Latest-checkpoint reads by whether the in-process copy could be used.", ["outcome"])
+DASHBOARD_SECONDS = Histogram("agent_dashboard_request_duration_seconds", "Latency of one dashboard HTTP attempt.", ["method", "status"])
+
+
+def outcome(error):
+    # GraphInterrupt is how a human-in-the-loop pause surfaces; it is not a failure
+    return "interrupted" if type(error).__name__ == "GraphInterrupt" else "error"
+
+
+class GraphMetricsHandler(BaseCallbackHandler):
+    """Times graph nodes, tool calls and chat model calls from LangChain callbacks.
+
+    Attach it once to the compiled graph; LangGraph tags every run with the node it belongs to.
+    """
+
+    # The bookkeeping is cheap, so do not hop to an executor thread for each event in async runs
+    run_inline = True
+
+    def __init__(self):
+        self._started = {}
+
+    def _start(self, run_id, *labels):
+        self._started[run_id] = (time.perf_counter(), labels)
+
+    def _stop(self, run_id):
+        start, labels = self._started.pop(run_id, (None, None))
+        if start is None:
+            return None, None
+        return time.perf_counter() - start, labels
+
+    def on_chain_start(self, serialized, inputs, *, run_id, metadata=None, name=None, **kwargs):
+        # Only the run that is the node itself, not the runnables nested inside it
+        node = (metadata or {}).get("langgraph_node")
+        if node is not None and name == node:
+            self._start(run_id, node)
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        elapsed, labels = self._stop(run_id)
+        if elapsed is not None:
+            NODE_SECONDS.observe(elapsed, node=labels[0], status="ok")
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        elapsed, labels = self._stop(run_id)
+        if elapsed is not None:
+            NODE_SECONDS.observe(elapsed, node=labels[0], status=outcome(error))
+
+    def on_tool_start(self, serialized, input_str, *, run_id, name=None, **kwargs):
+        self._start(run_id, name or (serialized or {}).get("name", "unknown"))
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        elapsed, labels = self._stop(run_id)
+        if elapsed is not None:
+            TOOL_SECONDS.observe(elapsed, tool=labels[0], status="ok")
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        elapsed, labels = self._stop(run_id)
+        if elapsed is not None:
+            TOOL_SECONDS.observe(elapsed, tool=labels[0], status=outcome(error))
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs):
+        metadata = metadata or {}
+        self._start(run_id, metadata.get("langgraph_node", "none"), metadata.get("ls_model_name", "unknown"))
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        elapsed, labels = self._stop(run_id)
+        if elapsed is None:
+            return
+        node, model = labels
+        LLM_SECONDS.observe(elapsed, node=node, model=model, status="ok")
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if usage:
+                    LLM_TOKENS.inc(usage.get("input_tokens", 0), node=node, model=model, kind="prompt")
+                    LLM_TOKENS.inc(usage.get("output_tokens", 0), node=node, model=model, kind="completion")
+                    LLM_TOKENS.inc((usage.get("input_token_details") or {}).get("cache_read", 0), node=node, model=model, kind="cached")
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        elapsed, labels = self._stop(run_id)
+        if elapsed is not None:
+            LLM_SECONDS.observe(elapsed, node=labels[0], model=labels[1], status="error")
+
+graph_metrics = GraphMetricsHandler()
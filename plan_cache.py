@@ -0,0 +1,251 @@
+import os
+import re
+import json
+import hashlib
+import atexit
+import threading
+from collections import OrderedDict
+import numpy as np
+import redis
+from tracing import logger
+from checkpoints import REDIS_URI
+
+PLAN_CACHE_ENABLED = os.getenv("PLAN_CACHE", "1") == "1"
+PLAN_CACHE_PATH = os.getenv("PLAN_CACHE_PATH", "plan_cache.json")
+PLAN_CACHE_SIZE = int(os.getenv("PLAN_CACHE_SIZE", "500"))
+PLAN_CACHE_THRESHOLD = float(os.getenv("PLAN_CACHE_THRESHOLD", "0.9"))
+# 'file' keeps the cache in PLAN_CACHE_PATH, for a single worker; 'redis' shares it between workers
+PLAN_CACHE_BACKEND = os.getenv("PLAN_CACHE_BACKEND", "file")
+PLAN_CACHE_REDIS_KEY = "plan_cache"
+# Stored plans are written out this many seconds after the first change, together
+PLAN_CACHE_SAVE_DELAY = float(os.getenv("PLAN_CACHE_SAVE_DELAY", "5"))
+EMBEDDING_DIM = 512
+
+# Entity values become numbered slots so "delete collection 'A'" and "delete collection 'B'"
+# share one cached plan. Applied in order; each match is removed before the next pattern runs,
+# and a match that would take in an earlier slot is left alone.
+SLOT_PATTERNS = [
+    re.compile(r"'([^']+)'"),
+    re.compile(r'"([^"]+)"'),
+    re.compile(r"\bdescription\s+of\s+(?:the\s+)?collection\s+\S+\s+(?:to|as)\s+(.+?)[.!?]?$", re.IGNORECASE),
+    re.compile(r"\bdescription\s*(?:as|is|to|:|=)?\s+(?!of\b)(.+?)[.!?]?$", re.IGNORECASE),
+    re.compile(r"\b(General|Face Recognition)\b", re.IGNORECASE),
+    re.compile(r"\b(?:named|called|titled)\s+([\w-]+)", re.IGNORECASE),
+    re.compile(r"\bid\s*:?\s*([\w-]+)", re.IGNORECASE),
+    re.compile(r"\bcollection\s+(?!with\b|named\b|called\b|titled\b|of\b|to\b|in\b|for\b|and\b|the\b|a\b|id\b|type\b|description\b)([\w-]+)", re.IGNORECASE),
+]
+WORD = re.compile(r"[a-z0-9_<>]+")
+SLOT = re.compile(r"<<(\d+)>>")
+# snake_case names in a plan step, i.e. tool names
+IDENTIFIER = re.compile(r"\b[a-z0-9]+(?:_[a-z0-9]+)+\b")
+# Shorter values are too likely to occur in a step by accident to be swapped for a slot
+MIN_SLOT_CHARS = 3
+
+
+def _slot(i):
+    return f"<<{i}>>"
+
+
+def parameterize(task):
+    """Split a task into (normalized template, slot values)."""
+    text = " ".join(task.strip().split())
+    values = []
+    for pattern in SLOT_PATTERNS:
+        def replace(match):
+            if SLOT.search(match.group(1)):
+                return match.group(0)
+            values.append(match.group(1))
+            start, end = match.start(1) - match.start(0), match.end(1) - match.start(0)
+            return match.group(0)[:start] + _slot(len(values) - 1) + match.group(0)[end:]
+        text = pattern.sub(replace, text)
+    template = re.sub(r"[^\w<> ]", "", text.lower())
+    return " ".join(template.split()), values
+
+
+def embed(template):
+    """Local hashed bag of words + character trigrams, L2-normalized."""
+    vector = np.zeros(EMBEDDING_DIM, dtype=np.float32)
+    words = WORD.findall(template)
+    features = words + [template[i:i + 3] for i in range(len(template) - 2)]
+    for feature in features:
+        digest = hashlib.md5(feature.encode()).digest()
+        vector[int.from_bytes(digest[:4], "little") % EMBEDDING_DIM] += 1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class PlanCache:
+    """Task -> plan cache in front of the planner LLM.
+
+    Lookup is exact on the parameterized template first, then nearest neighbour by cosine
+    similarity. A neighbour is only used when every literal word its plan copied from its own
+    task also appears in the new task, so a plan never carries over a value the user did not give.
+
+    Each entry owns one row of a preallocated embedding matrix, written when it is stored and
+    zeroed when it is evicted. Changes are persisted a few seconds later from a background thread:
+    to a Redis hash shared by all workers when `client` is given, else to the JSON file at `path`.
+    """
+
+    def __init__(self, path=PLAN_CACHE_PATH, maxsize=PLAN_CACHE_SIZE, threshold=PLAN_CACHE_THRESHOLD,
+                 client=None, save_delay=PLAN_CACHE_SAVE_DELAY):
+        self.path = path
+        self.client = client
+        self.maxsize = maxsize
+        self.threshold = threshold
+        self.save_delay = save_delay
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._matrix = np.zeros((maxsize, EMBEDDING_DIM), dtype=np.float32)
+        self._rows = {}
+        self._templates = [None] * maxsize
+        self._free = list(range(maxsize - 1, -1, -1))
+        # Templates stored or evicted since the last save
+        self._changed = set()
+        self._removed = set()
+        self._save_timer = None
+        self.exact_hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self._load()
+
+    def _load(self):
+        try:
+            if self.client is not None:
+                entries = [json.loads(value) for value in self.client.hvals(PLAN_CACHE_REDIS_KEY)]
+            elif self.path and os.path.exists(self.path):
+                with open(self.path) as f:
+                    entries = json.load(f)
+            else:
+                return
+            for entry in entries:
+                self._add(entry)
+        except (OSError, ValueError, KeyError, redis.RedisError) as e:
+            logger.warning("plan cache could not be loaded from %s: %s", self._location(), e)
+        self._removed.clear()
+
+    def _location(self):
+        return f"redis hash {PLAN_CACHE_REDIS_KEY}" if self.client is not None else self.path
+
+    def _add(self, entry):
+        template = entry["template"]
+        if template not in self._entries:
+            if len(self._entries) >= self.maxsize:
+                self._remove(next(iter(self._entries)))
+            row = self._free.pop()
+            self._matrix[row] = embed(template)
+            self._rows[template] = row
+            self._templates[row] = template
+        self._entries[template] = entry
+        self._entries.move_to_end(template)
+
+    def _remove(self, template):
+        del self._entries[template]
+        row = self._rows.pop(template)
+        self._matrix[row] = 0
+        self._templates[row] = None
+        self._free.append(row)
+        self._changed.discard(template)
+        self._removed.add(template)
+
+    def _schedule_save(self):
+        if self._save_timer is None and (self.client is not None or self.path):
+            self._save_timer = threading.Timer(self.save_delay, self.save)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+
+    def save(self):
+        """Write the changes since the last save; runs on the save timer's thread and at exit."""
+        with self._lock:
+            self._save_timer = None
+            changed = [self._entries[template] for template in self._changed]
+            removed = list(self._removed)
+            entries = list(self._entries.values())
+            self._changed.clear()
+            self._removed.clear()
+        if not changed and not removed:
+            return
+        try:
+            if self.client is not None:
+                pipeline = self.client.pipeline(transaction=False)
+                if changed:
+                    pipeline.hset(PLAN_CACHE_REDIS_KEY, mapping={entry["template"]: json.dumps(entry) for entry in changed})
+                if removed:
+                    pipeline.hdel(PLAN_CACHE_REDIS_KEY, *removed)
+                pipeline.execute()
+            else:
+                tmp_path = f"{self.path}.tmp"
+                with open(tmp_path, "w") as f:
+                    json.dump(entries, f)
+                os.replace(tmp_path, self.path)
+        except (OSError, redis.RedisError) as e:
+            logger.warning("plan cache could not be saved to %s: %s", self._location(), e)
+
+    def _fill(self, entry, values):
+        return [SLOT.sub(lambda match: values[int(match.group(1))], step) for step in entry["steps"]]
+
+    def lookup(self, task):
+        template, values = parameterize(task)
+        with self._lock:
+            entry = self._entries.get(template)
+            if entry is not None:
+                self._entries.move_to_end(template)
+                self.exact_hits += 1
+                return self._fill(entry, values)
+
+            scores = self._matrix @ embed(template)
+            best = int(np.argmax(scores))
+            # Free rows are zero, so they only come out on top when nothing is similar at all
+            entry = self._entries.get(self._templates[best])
+            if entry is not None and scores[best] >= self.threshold and self._compatible(entry, template, values):
+                self._entries.move_to_end(entry["template"])
+                self.similar_hits += 1
+                return self._fill(entry, values)
+
+            self.misses += 1
+            return None
+
+    def _compatible(self, entry, template, values):
+        if entry["slots"] != len(values):
+            return False
+        copied = set(WORD.findall(entry["template"])) & set(WORD.findall(" ".join(entry["steps"]).lower()))
+        return copied <= set(WORD.findall(template))
+
+    def store(self, task, steps):
+        template, values = parameterize(task)
+        identifiers = {name for step in steps for name in IDENTIFIER.findall(step.lower())}
+        for value in values:
+            # A value like "data" would also be found in get_all_data_collection; not safe to slot
+            if len(value) < MIN_SLOT_CHARS or any(value.lower() in name for name in identifiers - {value.lower()}):
+                return
+        templated = []
+        # Longest values first so a value that contains another is replaced whole; only whole
+        # words (quoted or not), never part of a longer word or snake_case name
+        order = sorted(range(len(values)), key=lambda i: len(values[i]), reverse=True)
+        for step in steps:
+            for i in order:
+                step = re.sub(rf"(?<!\w){re.escape(values[i])}(?!\w)", _slot(i), step)
+            templated.append(step)
+        if any(_slot(i) not in " ".join(templated) for i in range(len(values))):
+            # The plan does not reference every entity verbatim, so it cannot be re-filled safely
+            return
+        with self._lock:
+            self._add({"template": template, "steps": templated, "slots": len(values)})
+            self._changed.add(template)
+            self._schedule_save()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.exact_hits + self.similar_hits + self.misses
+            return {
+                "exact_hits": self.exact_hits,
+                "similar_hits": self.similar_hits,
+                "misses": self.misses,
+                "hit_rate": (self.exact_hits + self.similar_hits) / lookups if lookups else 0.0,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "threshold": self.threshold,
+            }
+
+
+plan_cache = PlanCache(client=redis.Redis.from_url(REDIS_URI) if PLAN_CACHE_BACKEND == "redis" else None)
+atexit.register(plan_cache.save)
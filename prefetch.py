@@ -0,0 +1,156 @@
+import os
+import re
+import json
+import asyncio
+import threading
+from cachetools import TTLCache
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from dashboard import collection_cache
+from metrics import PREFETCH_RESULTS
+from tracing import logger
+
+# Run the read-only steps that follow an interrupt while the human decides, so the resumed run
+# does not wait on the dashboard for them. Set READ_PREFETCH=0 to disable.
+READ_PREFETCH = os.getenv("READ_PREFETCH", "1") == "1"
+# How long a prefetched result may wait for the resume; writes through this process invalidate it
+# sooner, changes made directly in the dashboard only show up after this.
+READ_PREFETCH_TTL = float(os.getenv("READ_PREFETCH_TTL", "120"))
+READ_PREFETCH_THREADS = int(os.getenv("READ_PREFETCH_THREADS", "1024"))
+# Upper bound on dashboard reads started for one interrupt
+READ_PREFETCH_CALLS = int(os.getenv("READ_PREFETCH_CALLS", "8"))
+
+WRITE_TOOLS = ("create_data_collection", "update_data_collection", "delete_data_collection")
+QUOTED = re.compile(r"'([^']+)'")
+IDENTIFIER = re.compile(r"\w+")
+
+# Collection cache key whose version decides whether a prefetched result is still current
+CACHE_KEYS = {
+    "get_all_data_collections": lambda args: collection_cache.ALL,
+    "get_collection_by_name": lambda args: ("name", args["name"]),
+}
+
+
+def _paused_step(plan, messages):
+    """Index of the plan step whose tool call is waiting on the human, or None when it cannot be told.
+
+    Steps name their tool; when several do, the call's argument values or the number of calls of
+    that tool already finished in this run pick one.
+    """
+    run = []
+    for message in reversed(messages):
+        if isinstance(message, HumanMessage):
+            break
+        run.append(message)
+    run.reverse()
+    pending = next((message for message in reversed(run) if isinstance(message, AIMessage)), None)
+    if pending is None or not pending.tool_calls:
+        return None
+    tool_call = pending.tool_calls[0]
+    candidates = [i for i, step in enumerate(plan) if tool_call["name"] in IDENTIFIER.findall(step)]
+    values = [value for value in tool_call["args"].values() if isinstance(value, str) and value]
+    matching = [i for i in candidates if any(value in plan[i] for value in values)]
+    if len(matching) == 1:
+        return matching[0]
+    done = sum(1 for message in run if isinstance(message, ToolMessage) and message.name == tool_call["name"])
+    return candidates[done] if done < len(candidates) else None
+
+def upcoming_steps(state):
+    """Plan steps after the one that is waiting on the human; none when that step cannot be located."""
+    plan = state.get("plan") or []
+    current = state.get("current_instruction")
+    if current in plan:
+        return plan[plan.index(current) + 1:]
+    # Only cursor mode tracks the position; the replanner and fused nodes leave it at -1
+    cursor = state.get("plan_cursor", -1)
+    if cursor >= 0:
+        return plan[cursor + 1:]
+    paused = _paused_step(plan, state.get("messages") or [])
+    # Guessing would fetch reads that already ran instead of the ones ahead
+    return plan[paused + 1:] if paused is not None else []
+
+
+def planned_reads(steps):
+    """(tool name, args) of the reads in `steps` whose arguments are spelled out, up to the next write.
+
+    Reads after a write would see its result, so they are not worth fetching ahead. Batch write
+    tools contain the single-write names and stop the scan too.
+    """
+    calls = []
+    for step in steps:
+        if any(name in step for name in WRITE_TOOLS):
+            break
+        if "get_all_data_collections" in step:
+            calls.append(("get_all_data_collections", {}))
+        elif "get_collection_by_name" in step:
+            calls.extend(("get_collection_by_name", {"name": name}) for name in QUOTED.findall(step))
+    unique = []
+    for call in calls:
+        if call not in unique:
+            unique.append(call)
+    return unique[:READ_PREFETCH_CALLS]
+
+
+def _call_key(tool_name, args):
+    return tool_name, json.dumps(args, sort_keys=True)
+
+
+class ReadPrefetcher:
+    """Speculative results of upcoming read steps, per thread, used once on resume if still current.
+
+    Each result is stored with the collection cache version of the key it read, taken before the
+    fetch started; a write to that collection (or the list) in the meantime makes take() discard it.
+    """
+
+    def __init__(self, ttl=READ_PREFETCH_TTL, maxsize=READ_PREFETCH_THREADS):
+        self._results = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+
+    async def prefetch(self, thread_id, steps, tools_by_name):
+        calls = [(name, args) for name, args in planned_reads(steps) if name in tools_by_name]
+        self.discard(thread_id)
+        if not calls:
+            return
+
+        async def fetch(name, args):
+            version = collection_cache.version(CACHE_KEYS[name](args))
+            result = await tools_by_name[name].ainvoke(args)
+            # The read tools report failures as strings; those are left for the real call
+            if isinstance(result, (list, dict)):
+                return _call_key(name, args), (version, result)
+            return None
+
+        fetched = await asyncio.gather(*(fetch(name, args) for name, args in calls), return_exceptions=True)
+        results = {}
+        for entry in fetched:
+            if isinstance(entry, Exception):
+                logger.warning("read prefetch failed for thread %s: %s", thread_id, entry)
+            elif entry is not None:
+                results[entry[0]] = entry[1]
+        if results:
+            with self._lock:
+                self._results[thread_id] = results
+
+    def take(self, thread_id, tool_name, args):
+        """The prefetched result of this call, or None; a result is handed out at most once."""
+        if thread_id is None or tool_name not in CACHE_KEYS:
+            return None
+        with self._lock:
+            results = self._results.get(thread_id)
+            entry = results.pop(_call_key(tool_name, args), None) if results else None
+        if entry is None:
+            return None
+        version, result = entry
+        if version != collection_cache.version(CACHE_KEYS[tool_name](args)):
+            PREFETCH_RESULTS.inc(tool=tool_name, outcome="stale")
+            return None
+        PREFETCH_RESULTS.inc(tool=tool_name, outcome="hit")
+        return result
+
+    def discard(self, thread_id):
+        with self._lock:
+            results = self._results.pop(thread_id, None)
+        for name, _ in results or {}:
+            PREFETCH_RESULTS.inc(tool=name, outcome="unused")
+
+
+read_prefetcher = ReadPrefetcher()
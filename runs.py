@@ -0,0 +1,248 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+import hashlib
+from contextlib import asynccontextmanager
+import redis.asyncio as aredis
+from checkpoints import REDIS_URI
+from tracing import logger
+
+# 'redis': per-thread leases shared by every worker process (default, needed for multi-worker deployments).
+# 'local': leases only within this process, for single-worker runs without Redis (benchmarks, local dev).
+THREAD_LOCK = os.getenv("THREAD_LOCK", "redis")
+# A lease expires this many seconds after its last renewal, so a crashed worker never blocks a thread for long.
+# Renewed every third of that while the run is alive; in AGENT_ASYNC_MODE=0 the event loop is blocked
+# during a run, so there the TTL must exceed the longest run.
+THREAD_LEASE_TTL = float(os.getenv("THREAD_LEASE_TTL", "120"))
+# How long a finished run's result stays available at GET /runs/{run_id}
+RUN_RESULT_TTL = float(os.getenv("RUN_RESULT_TTL", "600"))
+
+LEASE_PREFIX = "thread_lease:"
+RUN_PREFIX = "agent_run:"
+
+# Compare-and-renew / compare-and-delete, so a worker can never touch a lease that expired and was re-taken
+RENEW_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+def fingerprint(payload):
+    """Stable hash of a request body; equal fingerprints on one thread are the same request sent twice."""
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+
+class RedisRunStore:
+    def __init__(self, client):
+        self._redis = client
+        self._renew = client.register_script(RENEW_SCRIPT)
+        self._release = client.register_script(RELEASE_SCRIPT)
+
+    async def acquire(self, thread_id, value, ttl):
+        return bool(await self._redis.set(LEASE_PREFIX + thread_id, value, nx=True, px=int(ttl * 1000)))
+
+    async def holder(self, thread_id):
+        value = await self._redis.get(LEASE_PREFIX + thread_id)
+        return json.loads(value) if value else None
+
+    async def renew(self, thread_id, value, ttl):
+        return bool(await self._renew(keys=[LEASE_PREFIX + thread_id], args=[value, int(ttl * 1000)]))
+
+    async def release(self, thread_id, value):
+        await self._release(keys=[LEASE_PREFIX + thread_id], args=[value])
+
+    async def set_run(self, run_id, record, ttl):
+        await self._redis.set(RUN_PREFIX + run_id, json.dumps(record, default=str), px=int(ttl * 1000))
+
+    async def get_run(self, run_id):
+        value = await self._redis.get(RUN_PREFIX + run_id)
+        return json.loads(value) if value else None
+
+
+class LocalRunStore:
+    """Same interface as RedisRunStore, in process memory."""
+
+    def __init__(self):
+        self._leases = {}
+        self._runs = {}
+
+    def _live(self, entries, key):
+        entry = entries.get(key)
+        if entry is not None and entry[1] < time.monotonic():
+            entries.pop(key, None)
+            return None
+        return entry
+
+    async def acquire(self, thread_id, value, ttl):
+        if self._live(self._leases, thread_id) is not None:
+            return False
+        self._leases[thread_id] = (value, time.monotonic() + ttl)
+        return True
+
+    async def holder(self, thread_id):
+        entry = self._live(self._leases, thread_id)
+        return json.loads(entry[0]) if entry else None
+
+    async def renew(self, thread_id, value, ttl):
+        entry = self._live(self._leases, thread_id)
+        if entry is None or entry[0] != value:
+            return False
+        self._leases[thread_id] = (value, time.monotonic() + ttl)
+        return True
+
+    async def release(self, thread_id, value):
+        entry = self._leases.get(thread_id)
+        if entry is not None and entry[0] == value:
+            del self._leases[thread_id]
+
+    async def set_run(self, run_id, record, ttl):
+        self._runs[run_id] = (record, time.monotonic() + ttl)
+
+    async def get_run(self, run_id):
+        entry = self._live(self._runs, run_id)
+        return entry[0] if entry else None
+
+
+class ThreadBusy(Exception):
+    """Another run holds the thread. `duplicate` is True when that run was started by an identical request."""
+
+    def __init__(self, thread_id, run_id, duplicate):
+        super().__init__(thread_id)
+        self.thread_id = thread_id
+        self.run_id = run_id
+        self.duplicate = duplicate
+
+
+class Lease:
+    def __init__(self, thread_id, run_id, fingerprint):
+        self.thread_id = thread_id
+        self.run_id = run_id
+        self.fingerprint = fingerprint
+        self.value = json.dumps({"run_id": run_id, "fingerprint": fingerprint})
+        self.task = None
+
+
+class ThreadRuns:
+    """At most one graph run per thread_id across all workers.
+
+    A run holds a lease on its thread while it executes. A second request for a busy thread gets
+    ThreadBusy with the running run's id; an identical request arriving at the same worker instead
+    waits for the running execution and shares its result, so a retry never repeats LLM work.
+    """
+
+    def __init__(self, store, lease_ttl=THREAD_LEASE_TTL, result_ttl=RUN_RESULT_TTL):
+        self.store = store
+        self.lease_ttl = lease_ttl
+        self.result_ttl = result_ttl
+        self._local = {}
+        # thread_id -> [lock, claims using it]; claims on different threads never wait for each other
+        self._claim_locks = {}
+
+    @asynccontextmanager
+    async def _claiming(self, thread_id):
+        entry = self._claim_locks.setdefault(thread_id, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._claim_locks[thread_id]
+
+    async def claim(self, thread_id, fingerprint):
+        async with self._claiming(thread_id):
+            local = self._local.get(thread_id)
+            if local is not None:
+                holder = await self.store.holder(thread_id)
+                if holder is not None and holder["run_id"] == local.run_id:
+                    raise ThreadBusy(thread_id, local.run_id, local.fingerprint == fingerprint)
+                # Its lease expired without a release (e.g. a stream whose body was never sent)
+                self._local.pop(thread_id, None)
+            lease = Lease(thread_id, uuid.uuid4().hex, fingerprint)
+            # A lease that expires between a failed acquire and the holder lookup is simply taken on the retry
+            for _ in range(2):
+                if await self.store.acquire(thread_id, lease.value, self.lease_ttl):
+                    self._local[thread_id] = lease
+                    await self.store.set_run(lease.run_id, {"status": "running", "thread_id": thread_id}, self.result_ttl)
+                    return lease
+                holder = await self.store.holder(thread_id)
+                if holder is not None:
+                    raise ThreadBusy(thread_id, holder["run_id"], holder["fingerprint"] == fingerprint)
+            raise ThreadBusy(thread_id, None, False)
+
+    async def _heartbeat(self, lease):
+        while True:
+            await asyncio.sleep(self.lease_ttl / 3)
+            if not await self.store.renew(lease.thread_id, lease.value, self.lease_ttl):
+                logger.warning("lease on thread %s was lost during run %s", lease.thread_id, lease.run_id)
+                return
+
+    @asynccontextmanager
+    async def hold(self, lease):
+        """Keep the lease alive for the duration of the block, then record the outcome and release it."""
+        heartbeat = asyncio.create_task(self._heartbeat(lease))
+        record = {"status": "failed", "thread_id": lease.thread_id}
+        try:
+            yield record
+            record["status"] = "done"
+        except BaseException as e:
+            record["error"] = str(e) or type(e).__name__
+            raise
+        finally:
+            heartbeat.cancel()
+            self._local.pop(lease.thread_id, None)
+            try:
+                await self.store.set_run(lease.run_id, record, self.result_ttl)
+                await self.store.release(lease.thread_id, lease.value)
+            except Exception as e:
+                # The lease still expires on its own after the TTL
+                logger.warning("could not release thread %s after run %s: %s", lease.thread_id, lease.run_id, e)
+
+    async def _execute(self, lease, work):
+        async with self.hold(lease) as record:
+            record["result"] = await work()
+        return record["result"]
+
+    async def run(self, thread_id, fingerprint, work):
+        """Run `work()` under the thread's lease and return its result.
+
+        An identical request already running in this process is joined instead of started again.
+        The execution is shielded, so a client that disconnects does not cancel a run holding the lease.
+        """
+        try:
+            lease = await self.claim(thread_id, fingerprint)
+        except ThreadBusy as busy:
+            local = self._local.get(thread_id)
+            if busy.duplicate and local is not None and local.task is not None:
+                return await asyncio.shield(local.task)
+            raise
+        lease.task = asyncio.ensure_future(self._execute(lease, work))
+        return await asyncio.shield(lease.task)
+
+    async def get(self, run_id):
+        return await self.store.get_run(run_id)
+
+
+@asynccontextmanager
+async def get_thread_runs():
+    if THREAD_LOCK == "local":
+        yield ThreadRuns(LocalRunStore())
+        return
+    pool = aredis.ConnectionPool.from_url(REDIS_URI, max_connections=10)
+    client = aredis.Redis(connection_pool=pool)
+    try:
+        yield ThreadRuns(RedisRunStore(client))
+    finally:
+        await client.aclose()
+        await pool.disconnect()
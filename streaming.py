@@ -0,0 +1,56 @@
+import json
+from langchain_core.messages import AIMessageChunk
+
+# Emitted by /run-agent/stream: graph progress as Server-Sent Events instead of one buffered reply
+STREAM_MODES = ["updates", "messages"]
+
+def sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+def to_events(mode, chunk):
+    """Translate one (mode, chunk) pair from graph.stream(stream_mode=STREAM_MODES) into (event, data) pairs."""
+    events = []
+    if mode == "messages":
+        message, metadata = chunk
+        if isinstance(message, AIMessageChunk) and message.content:
+            events.append(("token", {"node": metadata.get("langgraph_node"), "content": message.content}))
+        return events
+
+    for node, update in chunk.items():
+        if node == "__interrupt__":
+            events.append(("interrupt", update[-1].value))
+            continue
+        if not update:
+            continue
+        # By what the update carries, not the node: the cursor mode's advance node and the fused
+        # agent set the instruction too
+        if "plan" in update:
+            events.append(("plan", {"plan": update["plan"], "current_instruction": update["current_instruction"]}))
+        elif "current_instruction" in update:
+            events.append(("instruction", {"current_instruction": update["current_instruction"]}))
+        for message in update.get("messages", []):
+            if getattr(message, "tool_calls", None):
+                for tool_call in message.tool_calls:
+                    events.append(("tool_call", {"name": tool_call["name"], "args": tool_call["args"]}))
+            elif message.type == "tool":
+                events.append(("tool_result", {"name": message.name, "content": message.content}))
+            elif message.content != "":
+                events.append(("message", {"message": message.content}))
+    return events
+
+class EventCollector:
+    """Turns graph chunks into SSE frames and remembers what the buffered endpoint would have returned."""
+
+    def __init__(self):
+        self.result = None
+
+    def frames(self, mode, chunk):
+        for event, data in to_events(mode, chunk):
+            if event == "interrupt":
+                self.result = data
+            elif event in ("tool_result", "message") and data.get("content", data.get("message")) != "":
+                self.result = {"message": data.get("content", data.get("message"))}
+            yield sse(event, data)
+
+    def done(self):
+        return sse("done", self.result)
@@ -0,0 +1,9 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+# No OpenAI or Redis in tests: the models are benchmarks/fakes.py and thread leases stay in process
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+os.environ.setdefault("THREAD_LOCK", "local")
@@ -0,0 +1,74 @@
+"""Just enough of the checkpoint savers' RediSearch indexes over fakeredis, which has no FT.SEARCH."""
+import re
+from types import SimpleNamespace
+
+from langgraph.checkpoint.redis.base import CHECKPOINT_PREFIX, CHECKPOINT_BLOB_PREFIX, CHECKPOINT_WRITE_PREFIX, REDIS_KEY_SEPARATOR
+
+TAG = re.compile(r"@(\w+):\{((?:\\.|[^}])*)\}")
+
+
+def _tags(query):
+    tags = {}
+    for field, values in TAG.findall(str(query._filter_expression)):
+        tags[field] = {re.sub(r"\\(.)", r"\1", value) for value in re.split(r"(?<!\\)\|", values)}
+    return tags
+
+
+class FakeIndex:
+    def __init__(self, client, prefix):
+        self.client = client
+        self.prefix = prefix + REDIS_KEY_SEPARATOR
+
+    def _docs(self, query):
+        tags = _tags(query)
+        docs = []
+        for key in sorted(self.client.scan_iter(match=self.prefix + "*")):
+            key = key.decode() if isinstance(key, bytes) else key
+            document = self.client.json().get(key)
+            if all(str(document.get(field)) in values for field, values in tags.items()):
+                docs.append(SimpleNamespace(id=key, **{field: document.get(field) for field in query._return_fields}))
+        return SimpleNamespace(docs=docs[:query._num_results])
+
+    def search(self, query):
+        return self._docs(query)
+
+
+class AsyncFakeIndex(FakeIndex):
+    async def search(self, query):
+        docs = []
+        tags = _tags(query)
+        async for key in self.client.scan_iter(match=self.prefix + "*"):
+            key = key.decode() if isinstance(key, bytes) else key
+            document = await self.client.json().get(key)
+            if all(str(document.get(field)) in values for field, values in tags.items()):
+                docs.append(SimpleNamespace(id=key, **{field: document.get(field) for field in query._return_fields}))
+        return SimpleNamespace(docs=sorted(docs, key=lambda doc: doc.id)[:query._num_results])
+
+
+def fake_saver(client, index=FakeIndex):
+    """The parts of a RedisSaver that pruning uses."""
+    return SimpleNamespace(
+        _redis=client,
+        checkpoints_index=index(client, CHECKPOINT_PREFIX),
+        checkpoint_blobs_index=index(client, CHECKPOINT_BLOB_PREFIX),
+        checkpoint_writes_index=index(client, CHECKPOINT_WRITE_PREFIX),
+    )
+
+
+def store_checkpoint(client, thread_id, checkpoint_id, channel_versions, writes=1):
+    """Checkpoint, blob and write documents laid out the way RedisSaver stores them."""
+    def key(*parts):
+        return REDIS_KEY_SEPARATOR.join(parts)
+
+    thread = {"thread_id": thread_id, "checkpoint_ns": "__empty__"}
+    client.json().set(key(CHECKPOINT_PREFIX, thread_id, "__empty__", checkpoint_id), "$", {
+        **thread, "checkpoint_id": checkpoint_id, "checkpoint": {"channel_versions": channel_versions},
+    })
+    for channel, version in channel_versions.items():
+        client.json().set(key(CHECKPOINT_BLOB_PREFIX, thread_id, "__empty__", channel, version), "$", {
+            **thread, "channel": channel, "version": version,
+        })
+    for idx in range(writes):
+        client.json().set(key(CHECKPOINT_WRITE_PREFIX, thread_id, "__empty__", checkpoint_id, "task", str(idx)), "$", {
+            **thread, "checkpoint_id": checkpoint_id, "task_id": "task", "idx": idx,
+        })
@@ -0,0 +1,145 @@
+import asyncio
+import httpx
+import openai
+import pytest
+import admission
+import main
+from admission import Admitted, LLMScheduler, LLMOverloaded, TokenBucket, llm_priority, RESUME, NEW_THREAD
+
+
+def server_error():
+    response = httpx.Response(500, request=httpx.Request("POST", "https://api.openai.com/v1/chat/completions"))
+    return openai.InternalServerError("server error", response=response, body=None)
+
+
+class Flaky:
+    """Fails with each of `errors` in turn, then answers."""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def _next(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return "ok"
+
+    def invoke(self, input, config=None, **kwargs):
+        return self._next()
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        return self._next()
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(admission, "LLM_RETRY_BACKOFF", 0.0)
+
+
+@pytest.mark.parametrize("mode", ["sync", "async"])
+def test_server_error_then_success_is_retried(mode):
+    runnable = Flaky(server_error())
+    model = Admitted(runnable, LLMScheduler())
+    result = model.invoke("hi") if mode == "sync" else asyncio.run(model.ainvoke("hi"))
+    assert result == "ok" and runnable.calls == 2
+
+
+def test_connection_errors_give_up_after_the_retry_budget():
+    request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+    errors = [openai.APITimeoutError(request) for _ in range(admission.LLM_TRANSIENT_RETRIES + 1)]
+    runnable = Flaky(*errors)
+    with pytest.raises(openai.APITimeoutError):
+        Admitted(runnable, LLMScheduler()).invoke("hi")
+    assert runnable.calls == admission.LLM_TRANSIENT_RETRIES + 1
+
+
+def test_other_errors_are_not_retried():
+    runnable = Flaky(ValueError("bad request"))
+    with pytest.raises(ValueError):
+        Admitted(runnable, LLMScheduler()).invoke("hi")
+    assert runnable.calls == 1
+
+
+class Clock:
+    """Stands still until a test moves it."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def enqueue(scheduler, priority, tokens=1):
+    token = llm_priority.set(priority)
+    try:
+        return scheduler._enqueue(tokens)
+    finally:
+        llm_priority.reset(token)
+
+
+def test_token_bucket_refills_with_the_clock():
+    clock = Clock()
+    bucket = TokenBucket(60, clock)
+    bucket.take(60)
+    assert bucket.wait_for(20) == 20.0
+    clock.now = 15.0
+    bucket.refill(clock())
+    assert bucket.level == 15.0 and bucket.wait_for(20) == 5.0
+    clock.now = 600.0
+    bucket.refill(clock())
+    assert bucket.level == 60 and bucket.wait_for(1000) == 0.0
+
+
+def test_resume_is_admitted_before_earlier_new_threads():
+    clock = Clock()
+    scheduler = LLMScheduler(requests_per_minute=1, clock=clock)
+    first = enqueue(scheduler, NEW_THREAD)
+    second = enqueue(scheduler, NEW_THREAD)
+    resume = enqueue(scheduler, RESUME)
+
+    # Only the head may take the single request in the bucket
+    assert scheduler._try_admit(first) == 1.0
+    assert scheduler._try_admit(resume) == 0
+    # New threads keep their FIFO order and wait a full refill for the next request
+    assert scheduler._try_admit(second) == 1.0
+    assert scheduler._try_admit(first) == 60.0
+    clock.now = 45.0
+    assert scheduler._try_admit(first) == 15.0
+    clock.now = 60.0
+    assert scheduler._try_admit(first) == 0
+    assert scheduler._try_admit(second) == 60.0
+
+
+def test_pause_holds_the_head_until_the_clock_passes_it():
+    clock = Clock()
+    scheduler = LLMScheduler(clock=clock)
+    waiter = enqueue(scheduler, RESUME)
+    scheduler.pause(5)
+    assert scheduler._try_admit(waiter) == 5.0
+    clock.now = 5.0
+    assert scheduler._try_admit(waiter) == 0
+
+
+def test_admit_refuses_new_threads_first_when_the_queue_is_full():
+    clock = Clock()
+    scheduler = LLMScheduler(requests_per_minute=6, queue_size=2, resume_headroom=1, clock=clock)
+    scheduler.admit(NEW_THREAD)
+    enqueue(scheduler, NEW_THREAD)
+    enqueue(scheduler, NEW_THREAD)
+
+    with pytest.raises(LLMOverloaded) as overloaded:
+        scheduler.admit(NEW_THREAD)
+    # Two queued calls at 6 requests a minute drain in 20s, the Retry-After of the 503
+    assert overloaded.value.retry_after == 20.0
+    scheduler.admit(RESUME)
+
+    enqueue(scheduler, RESUME)
+    with pytest.raises(LLMOverloaded):
+        scheduler.admit(RESUME)
+
+
+def test_overloaded_is_a_503_with_retry_after():
+    response = main.overloaded_response(LLMOverloaded(20.0))
+    assert response.status_code == 503 and response.headers["Retry-After"] == "20"
@@ -0,0 +1,51 @@
+"""N concurrent /run-agent calls on different threads overlap their LLM and dashboard waits."""
+import time
+import asyncio
+import argparse
+import httpx
+import main
+from dashboard import dashboard, collection_cache
+from fakes import LLMStats, StubDashboard
+from run_agent_bench import install_fakes, run_task
+
+LLM_LATENCY = 0.2
+CONCURRENT = 8
+
+
+def bench_args(mode):
+    return argparse.Namespace(
+        llm_latency=LLM_LATENCY, mode=mode, topology="plan_execute", execution_mode="replanner",
+        plan_cache=False, agent_model_mode="single",
+    )
+
+
+async def timed_runs(count):
+    collection_cache.clear()
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=None) as client:
+        start = time.perf_counter()
+        results = await asyncio.gather(*(run_task(client, "list", f"c{i}", []) for i in range(count)))
+        elapsed = time.perf_counter() - start
+    # A list task finishes without interrupts, so each is exactly one /run-agent call
+    assert all(requests == 1 for _, requests in results)
+    return elapsed
+
+
+async def single_and_concurrent():
+    stub = StubDashboard(latency=0.05).start()
+    dashboard.base_url = stub.url
+    try:
+        async with main.lifespan(main.app):
+            single = await timed_runs(1)
+            concurrent = await timed_runs(CONCURRENT)
+    finally:
+        stub.stop()
+        await dashboard.aclose()
+    return single, concurrent
+
+
+def test_concurrent_run_agent_calls_overlap():
+    install_fakes(bench_args("async"), LLMStats())
+    single, concurrent = asyncio.run(single_and_concurrent())
+    # Serialized calls would take CONCURRENT * single; overlapping ones take about one call
+    assert concurrent < 2 * single, f"{CONCURRENT} concurrent calls took {concurrent:.2f}s, one took {single:.2f}s"
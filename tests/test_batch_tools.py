@@ -0,0 +1,68 @@
+import asyncio
+import pytest
+import tools
+from dashboard import dashboard, collection_cache
+from fakes import StubDashboard
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    stub = StubDashboard().start()
+    monkeypatch.setattr(dashboard, "base_url", stub.url)
+    collection_cache.clear()
+    yield stub
+    stub.stop()
+    dashboard.close()
+
+
+@pytest.fixture
+def approvals(monkeypatch):
+    """Approve every interrupt and keep its payload."""
+    payloads = []
+
+    def approve(payload):
+        payloads.append(payload)
+        return {"send": "Yes"}
+
+    monkeypatch.setattr(tools, "interrupt", approve)
+    return payloads
+
+
+def invoke(tool, args, mode):
+    if mode == "async":
+        async def ainvoke():
+            try:
+                return await tool.ainvoke(args)
+            finally:
+                # The client belongs to this loop, which asyncio.run closes
+                await dashboard.aclose()
+        return asyncio.run(ainvoke())
+    return tool.invoke(args)
+
+
+@pytest.mark.parametrize("mode", ["sync", "async"])
+def test_create_batch(stub, approvals, mode):
+    items = [{"name": f"c{i}", "type": "General", "description": "d"} for i in range(3)]
+    result = invoke(tools.create_data_collections_batch, {"items": items}, mode)
+    assert result["succeeded"] == 3 and result["failed"] == 0
+    assert approvals[0]["args"]["items"] == items
+    assert sorted(box["name"] for box in stub.boxes.values()) == ["c0", "c1", "c2"]
+
+
+@pytest.mark.parametrize("mode", ["sync", "async"])
+def test_update_batch(stub, approvals, mode):
+    ids = [stub.add(f"c{i}")["id"] for i in range(2)]
+    items = [{"id": id, "description": "new"} for id in ids]
+    result = invoke(tools.update_data_collections_batch, {"items": items}, mode)
+    assert result["succeeded"] == 2 and result["failed"] == 0
+    assert approvals[0]["args"]["items"] == items
+    assert all(stub.boxes[id]["description"] == "new" for id in ids)
+
+
+@pytest.mark.parametrize("mode", ["sync", "async"])
+def test_delete_batch(stub, approvals, mode):
+    ids = [stub.add(f"c{i}")["id"] for i in range(2)]
+    result = invoke(tools.delete_data_collections_batch, {"ids": ids + ["missing"]}, mode)
+    assert [entry["status"] for entry in result["results"]] == ["deleted", "deleted", "not_found"]
+    assert approvals[0]["args"]["ids"] == ids + ["missing"]
+    assert stub.boxes == {}
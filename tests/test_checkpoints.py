@@ -0,0 +1,49 @@
+import asyncio
+import fakeredis
+from fakeredis import aioredis
+from checkpoints import prune_thread, aprune_thread
+from redis_index import fake_saver, store_checkpoint, AsyncFakeIndex
+
+
+def store_thread(client, thread_id="t1"):
+    # messages changes every step; the task channel only at the first, so every checkpoint keeps its blob
+    for step in range(1, 6):
+        store_checkpoint(client, thread_id, f"ckpt-{step}", {"messages": f"v{step}", "task": "v1"}, writes=2)
+
+
+def remaining(client, thread_id="t1"):
+    keys = sorted(key.decode() for key in client.keys(f"*:{thread_id}:*"))
+    return {
+        "checkpoints": [key.rsplit(":", 1)[1] for key in keys if key.startswith("checkpoint:")],
+        "blobs": [key.split(":", 3)[3] for key in keys if key.startswith("checkpoint_blob:")],
+        "writes": sorted({key.split(":")[3] for key in keys if key.startswith("checkpoint_write:")}),
+    }
+
+
+KEPT = {
+    "checkpoints": ["ckpt-4", "ckpt-5"],
+    "blobs": ["messages:v4", "messages:v5", "task:v1"],
+    "writes": ["ckpt-4", "ckpt-5"],
+}
+
+
+def test_prune_keeps_the_newest_checkpoints_and_what_they_reference():
+    client = fakeredis.FakeRedis()
+    store_thread(client)
+    store_thread(client, "t2")
+    assert prune_thread(fake_saver(client), "t1", keep=2) == 3
+    assert remaining(client) == KEPT
+    assert len(remaining(client, "t2")["checkpoints"]) == 5
+    assert prune_thread(fake_saver(client), "t1", keep=2) == 0
+
+
+def test_aprune_keeps_the_newest_checkpoints_and_what_they_reference():
+    server = fakeredis.FakeServer()
+    store_thread(fakeredis.FakeRedis(server=server))
+
+    async def prune():
+        client = aioredis.FakeRedis(server=server)
+        return await aprune_thread(fake_saver(client, AsyncFakeIndex), "t1", keep=2)
+
+    assert asyncio.run(prune()) == 3
+    assert remaining(fakeredis.FakeRedis(server=server)) == KEPT
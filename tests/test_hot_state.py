@@ -0,0 +1,109 @@
+import asyncio
+import fakeredis
+from fakeredis import aioredis
+from langgraph.checkpoint.base import empty_checkpoint, create_checkpoint
+from langgraph.checkpoint.memory import InMemorySaver
+from checkpoints import HotStateSaver
+
+
+class CountingSaver(InMemorySaver):
+    """InMemorySaver that counts latest-checkpoint loads (its aget_tuple goes through get_tuple)."""
+
+    def __init__(self):
+        super().__init__()
+        self.loads = 0
+
+    def get_tuple(self, config):
+        self.loads += 1
+        return super().get_tuple(config)
+
+
+def latest(thread_id):
+    return {"configurable": {"thread_id": thread_id, "checkpoint_ns": ""}}
+
+
+def put_step(saver, thread_id, step, parent=None):
+    """Store checkpoint `step` of a thread with one write pending on it; returns its config."""
+    checkpoint = create_checkpoint(empty_checkpoint(), None, step)
+    checkpoint["channel_values"] = {"step": step}
+    checkpoint["channel_versions"] = {"step": step}
+    config = saver.put(parent or latest(thread_id), checkpoint, {"step": step}, {"step": step})
+    saver.put_writes(config, [("messages", f"write-{step}")], "task")
+    return config
+
+
+def step_of(saved):
+    return saved.checkpoint["channel_values"]["step"]
+
+
+def workers():
+    """Two processes' savers over the same checkpoints and the same Redis."""
+    backing, server = CountingSaver(), fakeredis.FakeServer()
+    return backing, HotStateSaver(backing, fakeredis.FakeRedis(server=server)), HotStateSaver(backing, fakeredis.FakeRedis(server=server))
+
+
+def test_miss_then_hits_follow_own_writes():
+    backing, hot, _ = workers()
+    config = put_step(hot, "t1", 1)
+    # Never read here, so the first read loads
+    assert step_of(hot.get_tuple(latest("t1"))) == 1 and backing.loads == 1
+    assert step_of(hot.get_tuple(latest("t1"))) == 1 and backing.loads == 1
+    put_step(hot, "t1", 2, config)
+    saved = hot.get_tuple(latest("t1"))
+    assert backing.loads == 1
+    assert step_of(saved) == 2 and [value for _, _, value in saved.pending_writes] == ["write-2"]
+    loaded = backing.get_tuple(latest("t1"))
+    # InMemorySaver also copies config keys into the stored metadata; RedisSaver stores it as given
+    assert (saved.config, saved.checkpoint, saved.parent_config) == (loaded.config, loaded.checkpoint, loaded.parent_config)
+    assert saved.metadata["step"] == 2
+
+
+def test_write_from_another_process_makes_the_copy_stale():
+    backing, hot, other = workers()
+    config = put_step(hot, "t1", 1)
+    hot.get_tuple(latest("t1"))
+    put_step(other, "t1", 2, config)
+    assert step_of(hot.get_tuple(latest("t1"))) == 2 and backing.loads == 2
+    assert step_of(hot.get_tuple(latest("t1"))) == 2 and backing.loads == 2
+
+
+def test_expired_counter_is_never_trusted():
+    backing, hot, _ = workers()
+    put_step(hot, "t1", 1)
+    hot.get_tuple(latest("t1"))
+    hot.client.delete(hot._version_key(("t1", "")))
+    for loads in (2, 3):
+        assert step_of(hot.get_tuple(latest("t1"))) == 1 and backing.loads == loads
+
+
+def test_writes_on_a_thread_not_read_here_are_loaded_whole():
+    backing, hot, other = workers()
+    config = put_step(other, "t1", 1)
+    other.get_tuple(latest("t1"))
+    # hot never read t1: its write must not create a partial copy
+    hot.put_writes(config, [("messages", "late")], "task-2")
+    saved = hot.get_tuple(latest("t1"))
+    assert sorted(value for _, _, value in saved.pending_writes) == ["late", "write-1"]
+    # and other sees the version move and reloads
+    saved = other.get_tuple(latest("t1"))
+    assert sorted(value for _, _, value in saved.pending_writes) == ["late", "write-1"]
+
+
+def test_async_path_uses_the_same_counters():
+    backing, server = CountingSaver(), fakeredis.FakeServer()
+
+    async def run():
+        hot = HotStateSaver(backing, aioredis.FakeRedis(server=server))
+        checkpoint = create_checkpoint(empty_checkpoint(), None, 1)
+        checkpoint["channel_values"] = {"step": 1}
+        checkpoint["channel_versions"] = {"step": 1}
+        config = await hot.aput(latest("t1"), checkpoint, {"step": 1}, {"step": 1})
+        await asyncio.gather(hot.aput_writes(config, [("messages", "a")], "task"), hot.aget_tuple(latest("t1")))
+        first = await hot.aget_tuple(latest("t1"))
+        loads = backing.loads
+        second = await hot.aget_tuple(latest("t1"))
+        return first, second, loads
+
+    first, second, loads = asyncio.run(run())
+    assert backing.loads == loads
+    assert [value for _, _, value in second.pending_writes] == ["a"] and first == second
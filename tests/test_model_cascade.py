@@ -0,0 +1,21 @@
+from langchain_core.messages import AIMessage
+from agents import escalation_reason, _agent_prompt
+
+
+def answer(name, args):
+    return AIMessage(content="", tool_calls=[{"name": name, "args": args, "id": "call-1"}])
+
+
+def test_batch_tool_named_in_instruction_is_not_wrong_tool():
+    prompt = _agent_prompt("Delete ids 1 and 2 using delete_data_collections_batch", "")
+    assert escalation_reason(answer("delete_data_collections_batch", {"ids": ["1", "2"]}), prompt) is None
+
+
+def test_other_tool_than_the_named_one_escalates():
+    prompt = _agent_prompt("Delete id 1 using delete_data_collection", "")
+    assert escalation_reason(answer("delete_data_collections_batch", {"ids": ["1"]}), prompt) == "wrong_tool"
+
+
+def test_tool_name_inside_a_longer_name_does_not_count_as_named():
+    prompt = _agent_prompt("Delete ids 1 and 2 using delete_data_collections_batch", "")
+    assert escalation_reason(answer("delete_data_collection", {"id": "1"}), prompt) == "wrong_tool"
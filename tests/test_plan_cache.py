@@ -0,0 +1,59 @@
+import fakeredis
+from plan_cache import PlanCache, parameterize
+
+DELETE_STEPS = ["Call get_collection_by_name with name '{}'", "Call delete_data_collection with the id"]
+
+
+def steps_for(name):
+    return [step.format(name) for step in DELETE_STEPS]
+
+
+def test_later_patterns_do_not_take_in_slots():
+    assert parameterize("Create collection 'a' of type General with description 'x'")[1] == ["a", "x", "General"]
+    assert parameterize("Update the description of collection Sales to new stuff")[1] == ["new stuff", "Sales"]
+
+
+def test_store_does_not_slot_inside_tool_names():
+    cache = PlanCache(path=None)
+    cache.store("Delete collection 'data'", steps_for("data"))
+    assert cache.stats()["size"] == 0
+    cache.store("Delete collection 'Marketing'", steps_for("Marketing"))
+    assert cache.lookup("Delete collection 'Sales'") == steps_for("Sales")
+
+
+def test_store_refuses_short_values():
+    cache = PlanCache(path=None)
+    cache.store("Delete collection 'ab'", steps_for("ab"))
+    assert cache.stats()["size"] == 0
+
+
+def test_evicted_entries_free_their_row():
+    cache = PlanCache(path=None, maxsize=2)
+    tasks = ["Delete collection '{}'", "Remove the collection '{}' from the dashboard now", "Please get rid of collection '{}'"]
+    for task in tasks:
+        cache.store(task.format("Marketing"), steps_for("Marketing"))
+    assert cache.stats()["size"] == 2
+    assert cache.lookup(tasks[0].format("Sales")) is None
+    assert cache.lookup(tasks[2].format("Sales")) == steps_for("Sales")
+
+
+def test_saves_are_batched_off_the_caller(tmp_path):
+    path = tmp_path / "plan_cache.json"
+    cache = PlanCache(path=str(path), save_delay=60)
+    cache.store("Delete collection 'Marketing'", steps_for("Marketing"))
+    assert not path.exists()
+    cache.save()
+    assert PlanCache(path=str(path)).lookup("Delete collection 'Sales'") == steps_for("Sales")
+
+
+def test_redis_backend_is_shared_between_workers():
+    server = fakeredis.FakeServer()
+    first = PlanCache(client=fakeredis.FakeRedis(server=server), maxsize=1, save_delay=60)
+    first.store("Delete collection 'Marketing'", steps_for("Marketing"))
+    first.save()
+    second = PlanCache(client=fakeredis.FakeRedis(server=server))
+    assert second.lookup("Delete collection 'Sales'") == steps_for("Sales")
+
+    first.store("Remove the collection 'Marketing' from the dashboard now", steps_for("Marketing"))
+    first.save()
+    assert fakeredis.FakeRedis(server=server).hlen("plan_cache") == 1
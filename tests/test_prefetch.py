@@ -0,0 +1,53 @@
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from prefetch import upcoming_steps, planned_reads
+
+PLAN = [
+    "Call get_collection_by_name with name 'a'",
+    "Call delete_data_collection with the id of 'a'",
+    "Call get_collection_by_name with name 'b'",
+    "Call delete_data_collection with the id of 'b'",
+]
+
+
+def call(name, args, id):
+    return AIMessage(content="", tool_calls=[{"name": name, "args": args, "id": id}])
+
+
+def result(name, id):
+    return ToolMessage(content="{}", name=name, tool_call_id=id)
+
+
+def paused_state(messages):
+    # Replanner and fused modes: the instruction is reworded and plan_cursor is -1
+    return {"plan": PLAN, "current_instruction": "delete the one found", "plan_cursor": -1, "messages": messages}
+
+
+def test_cursor_mode_reads_after_the_cursor():
+    state = {"plan": PLAN, "current_instruction": "delete the one found", "plan_cursor": 1}
+    assert upcoming_steps(state) == PLAN[2:]
+
+
+def test_paused_step_is_found_from_the_pending_tool_call():
+    messages = [
+        HumanMessage(content="delete a and b"),
+        call("get_collection_by_name", {"name": "a"}, "1"), result("get_collection_by_name", "1"),
+        call("delete_data_collection", {"id": "17"}, "2"),
+    ]
+    assert upcoming_steps(paused_state(messages)) == PLAN[2:]
+    assert planned_reads(upcoming_steps(paused_state(messages))) == [("get_collection_by_name", {"name": "b"})]
+
+
+def test_repeated_tool_is_told_apart_by_the_calls_already_done():
+    messages = [
+        HumanMessage(content="delete a and b"),
+        call("delete_data_collection", {"id": "17"}, "1"), result("delete_data_collection", "1"),
+        call("get_collection_by_name", {"name": "b"}, "2"), result("get_collection_by_name", "2"),
+        call("delete_data_collection", {"id": "18"}, "3"),
+    ]
+    assert upcoming_steps(paused_state(messages)) == []
+    assert upcoming_steps(paused_state(messages[:2])) == PLAN[2:]
+
+
+def test_unknown_position_prefetches_nothing():
+    messages = [HumanMessage(content="delete a and b"), call("talk_to_human", {"question": "sure?"}, "1")]
+    assert upcoming_steps(paused_state(messages)) == []
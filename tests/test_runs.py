@@ -0,0 +1,93 @@
+import json
+import time
+import asyncio
+import pytest
+from fakeredis import aioredis
+import main
+from runs import ThreadRuns, ThreadBusy, LocalRunStore, RedisRunStore
+
+
+def store_for(kind):
+    return LocalRunStore() if kind == "local" else RedisRunStore(aioredis.FakeRedis())
+
+
+STORES = pytest.mark.parametrize("kind", ["local", "redis"])
+
+
+@STORES
+def test_claim_then_busy_for_same_and_different_requests(kind):
+    async def scenario():
+        runs = ThreadRuns(store_for(kind))
+        lease = await runs.claim("t1", "request-a")
+        with pytest.raises(ThreadBusy) as same:
+            await runs.claim("t1", "request-a")
+        with pytest.raises(ThreadBusy) as other:
+            await runs.claim("t1", "request-b")
+        other_thread = await runs.claim("t2", "request-b")
+        return lease, same.value, other.value, other_thread
+
+    lease, same, other, other_thread = asyncio.run(scenario())
+    assert (same.run_id, same.duplicate) == (lease.run_id, True)
+    assert (other.run_id, other.duplicate) == (lease.run_id, False)
+    assert other_thread.run_id != lease.run_id
+
+
+def test_busy_responses_are_202_for_a_duplicate_and_409_otherwise():
+    duplicate = main.busy_response(ThreadBusy("t1", "run-1", True))
+    conflict = main.busy_response(ThreadBusy("t1", "run-1", False))
+    assert duplicate.status_code == 202 and json.loads(duplicate.body)["poll"] == "/runs/run-1"
+    assert conflict.status_code == 409 and duplicate.headers["Retry-After"] == "1"
+
+
+@STORES
+def test_identical_request_joins_the_running_one(kind):
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"message": "done"}
+
+    async def scenario():
+        runs = ThreadRuns(store_for(kind))
+        results = await asyncio.gather(runs.run("t1", "request-a", work), runs.run("t1", "request-a", work))
+        with pytest.raises(ThreadBusy):
+            await asyncio.gather(runs.run("t1", "request-a", work), runs.run("t1", "request-b", work))
+        return results
+
+    assert asyncio.run(scenario()) == [{"message": "done"}] * 2
+    assert len(calls) == 2
+
+
+@STORES
+def test_lease_expires_without_heartbeat_and_is_renewed_with_one(kind):
+    async def scenario():
+        runs = ThreadRuns(store_for(kind), lease_ttl=0.3)
+        await runs.claim("t1", "request-a")
+        await asyncio.sleep(0.5)
+        # Never held, so nothing renewed it
+        lease = await runs.claim("t1", "request-b")
+        async with runs.hold(lease):
+            await asyncio.sleep(0.9)
+            with pytest.raises(ThreadBusy):
+                await runs.claim("t1", "request-c")
+        return await runs.get(lease.run_id)
+
+    assert asyncio.run(scenario())["status"] == "done"
+
+
+class SlowStore(LocalRunStore):
+    async def acquire(self, thread_id, value, ttl):
+        await asyncio.sleep(0.1)
+        return await super().acquire(thread_id, value, ttl)
+
+
+def test_claims_on_different_threads_do_not_wait_for_each_other():
+    async def scenario():
+        runs = ThreadRuns(SlowStore())
+        start = time.perf_counter()
+        await asyncio.gather(*(runs.claim(f"t{i}", "request") for i in range(8)))
+        return time.perf_counter() - start, runs._claim_locks
+
+    elapsed, locks = asyncio.run(scenario())
+    assert elapsed < 0.5 and locks == {}
@@ -0,0 +1,51 @@
+import json
+import asyncio
+import argparse
+import httpx
+import pytest
+import main
+from dashboard import dashboard, collection_cache
+from fakes import LLMStats, StubDashboard, task_text
+from run_agent_bench import install_fakes
+
+
+def parse_sse(text):
+    events = []
+    for frame in text.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in frame.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+async def stream_delete(name):
+    stub = StubDashboard().start()
+    stub.add(name)
+    dashboard.base_url = stub.url
+    collection_cache.clear()
+    try:
+        async with main.lifespan(main.app):
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=None) as client:
+                response = await client.post("/run-agent/stream", json={"query": task_text("delete", name), "thread_id": f"stream-{name}"})
+                return parse_sse(response.text)
+    finally:
+        stub.stop()
+        await dashboard.aclose()
+
+
+@pytest.mark.parametrize("execution_mode", ["cursor", "replanner"])
+def test_stream_reports_every_instruction(execution_mode):
+    args = argparse.Namespace(
+        llm_latency=0.0, mode="async", topology="plan_execute", execution_mode=execution_mode,
+        plan_cache=False, agent_model_mode="single",
+    )
+    install_fakes(args, LLMStats())
+    events = asyncio.run(stream_delete("Marketing"))
+    names = [event for event, _ in events]
+    plan = next(data["plan"] for event, data in events if event == "plan")
+    instructions = [data["current_instruction"] for event, data in events if event == "instruction"]
+    # The lookup step ran, then the stream moved on to the delete step and paused for approval
+    assert instructions and "delete_data_collection" in instructions[-1]
+    if execution_mode == "cursor":
+        assert instructions == plan[1:]
+    assert names[-2:] == ["interrupt", "done"]
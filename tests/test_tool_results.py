@@ -0,0 +1,69 @@
+import asyncio
+import json
+import fakeredis
+import httpx
+from fakeredis import aioredis
+from langchain_core.messages import AIMessage
+from langchain_core.tools import tool
+import main
+import tools
+from tools import BasicToolNode, ToolResultStore, tool_succeeded, TOOL_RESULT_INLINE_CHARS
+
+BOXES = {"boxes": [{"id": str(i), "name": f"collection-{i}", "type": "General"} for i in range(200)]}
+CALL = {"name": "get_all_data_collections", "args": {}, "id": "call-1"}
+
+
+@tool("get_all_data_collections")
+def list_everything():
+    """Every collection."""
+    return BOXES
+
+
+def node_inputs():
+    return {"messages": [AIMessage(content="", tool_calls=[CALL])]}
+
+
+def config(thread_id):
+    return {"configurable": {"thread_id": thread_id}}
+
+
+async def read_back(thread_id, ref):
+    # The worker answering the read is not the one that ran the tool; they only share Redis
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test") as client:
+        return await client.get(f"/threads/{thread_id}/tool-results/{ref}")
+
+
+def assert_compacted(message):
+    content = json.loads(message.content)
+    assert len(message.content) <= TOOL_RESULT_INLINE_CHARS and content["ref"] == "call-1"
+    assert message.artifact == {"succeeded": True} and tool_succeeded(message)
+
+
+def test_compacted_result_is_readable_from_another_worker(monkeypatch):
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(tools.compacted_results, "client", fakeredis.FakeRedis(server=server))
+    message = BasicToolNode([list_everything])(node_inputs(), config("t1"))["messages"][0]
+    assert_compacted(message)
+
+    reader = ToolResultStore()
+    reader.client = fakeredis.FakeRedis(server=server)
+    monkeypatch.setattr(main, "compacted_results", reader)
+    monkeypatch.setattr(main, "ASYNC_MODE", False)
+    response = asyncio.run(read_back("t1", "call-1"))
+    assert response.status_code == 200 and response.json()["result"] == BOXES
+    assert asyncio.run(read_back("t2", "call-1")).status_code == 404
+    assert reader.client.ttl("tool_result:t1:call-1") == tools.TOOL_RESULT_TTL
+
+
+def test_async_node_stores_through_the_async_client(monkeypatch):
+    server = fakeredis.FakeServer()
+
+    async def run():
+        tools.compacted_results.client = aioredis.FakeRedis(server=server)
+        message = (await BasicToolNode([list_everything]).acall(node_inputs(), config("t1")))["messages"][0]
+        assert_compacted(message)
+        return (await read_back("t1", "call-1")).json()["result"]
+
+    monkeypatch.setattr(tools.compacted_results, "client", None)
+    monkeypatch.setattr(main, "ASYNC_MODE", True)
+    assert asyncio.run(run()) == BOXES
@@ -0,0 +1,61 @@
+import pytest
+import tools
+from dashboard import dashboard
+from test_batch_tools import stub, invoke
+
+MODES = pytest.mark.parametrize("mode", ["sync", "async"])
+
+
+@pytest.fixture
+def approvals(monkeypatch):
+    """Approve every interrupt with the arguments it proposed."""
+    monkeypatch.setattr(tools, "interrupt", lambda payload: {**payload["args"], "send": "Yes"})
+
+
+@pytest.fixture
+def unreachable(monkeypatch):
+    # Nothing listens on port 9 (discard); retries of idempotent verbs do not sleep
+    monkeypatch.setattr(dashboard, "base_url", "http://127.0.0.1:9/api/boxes")
+    monkeypatch.setattr(dashboard, "backoff", 0)
+    tools.collection_cache.clear()
+    yield
+    dashboard.close()
+
+
+@MODES
+def test_single_tools_round_trip(stub, approvals, mode):
+    created = invoke(tools.create_data_collection, {"name": "a", "type": "General", "description": "d"}, mode)
+    assert created["output"].startswith("✅")
+    box = invoke(tools.get_collection_by_name, {"name": "a"}, mode)
+    requests = stub.requests
+    # Served from the collection cache the second time
+    assert invoke(tools.get_collection_by_name, {"name": "a"}, mode) == box and stub.requests == requests
+    assert invoke(tools.get_all_data_collection, {}, mode)["boxes"] == [{"id": box["id"], "name": "a", "type": "General"}]
+    assert invoke(tools.update_data_collection, {"id": box["id"], "description": "new"}, mode) == {"message": "Successfully updated"}
+    assert invoke(tools.delete_data_collection, {"id": box["id"]}, mode) == {"message": "Successfully deleted"}
+    assert stub.boxes == {}
+
+
+@MODES
+def test_error_responses_are_handled_in_the_tool(stub, approvals, mode):
+    assert invoke(tools.get_collection_by_name, {"name": "missing"}, mode) == "Data collection with name 'missing' not found."
+    assert invoke(tools.update_data_collection, {"id": "404", "name": "b"}, mode) == {"message": "Backend api failed to update, please try later"}
+    assert invoke(tools.delete_data_collection, {"id": "404"}, mode) == {"message": "Collection not found"}
+
+
+@MODES
+def test_transport_errors_are_handled_in_the_tool(unreachable, approvals, mode):
+    assert invoke(tools.create_data_collection, {"name": "a", "type": "General", "description": "d"}, mode)["output"].startswith("❌ Failed to create")
+    assert invoke(tools.get_all_data_collection, {}, mode).startswith("Failed to fetch data collections")
+    assert invoke(tools.get_collection_by_name, {"name": "a"}, mode).startswith("Failed to fetch data collection")
+    assert invoke(tools.update_data_collection, {"id": "1", "name": "b"}, mode)["message"].startswith("Backend api failed to update, please try later: ")
+    assert invoke(tools.delete_data_collection, {"id": "1"}, mode)["message"].startswith("Error during deletion")
+    result = invoke(tools.delete_data_collections_batch, {"ids": ["1", "2"]}, mode)
+    assert result["failed"] == 2 and all(item["status"] == "failed" for item in result["results"])
+
+
+def test_rejections_skip_the_dashboard(stub, monkeypatch):
+    monkeypatch.setattr(tools, "interrupt", lambda payload: {"send": "No", "feedback": "keep it"})
+    assert invoke(tools.update_data_collection, {"id": "1", "name": "b"}, "sync") == {"message": "User, rejected to update the collection, USER FEEDBACK: keep it"}
+    assert invoke(tools.delete_data_collection, {"id": "1"}, "async") == {"message": "User rejected the deletion request."}
+    assert stub.requests == 0
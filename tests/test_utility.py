@@ -0,0 +1,75 @@
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+import graph
+from utility import apply_budget, update_transcript, render_transcript, count_tokens
+
+
+def test_apply_budget_keeps_the_newest_lines_that_fit():
+    lines = ["a" * 40, "b" * 40, "c" * 40]  # 11 tokens each
+    assert apply_budget(lines, budget=22) == (lines[1:], lines[:1])
+    assert apply_budget(lines, budget=33) == (lines, [])
+    assert apply_budget([], budget=10) == ([], [])
+
+
+def test_apply_budget_always_keeps_the_last_line():
+    lines = ["short", "x" * 400]
+    assert count_tokens(lines[-1]) > 10
+    assert apply_budget(lines, budget=10) == (lines[1:], lines[:1])
+
+
+def messages():
+    return [
+        HumanMessage(content="delete a"),
+        AIMessage(content="", tool_calls=[{"name": "get_collection_by_name", "args": {"name": "a"}, "id": "1"}]),
+        ToolMessage(content="{'id': 7}", name="get_collection_by_name", tool_call_id="1"),
+        AIMessage(content="Deleted a"),
+    ]
+
+
+def test_update_transcript_renders_only_messages_after_the_cursor():
+    history = messages()
+    update, evicted = update_transcript({"messages": history[:2]})
+    assert update == {"transcript": ["HUMAN: delete a", "AI: called tool -> get_collection_by_name with args {'name': 'a'}"], "transcript_cursor": 2}
+    assert evicted == []
+
+    # Lines already in the transcript are not formatted again, even if the messages would now render differently
+    state = {"messages": history, "transcript": ["kept"], "transcript_cursor": 2}
+    update, evicted = update_transcript(state)
+    assert update == {"transcript": ["kept", "TOOL: get_collection_by_name returned -> {'id': 7}", "AI: Deleted a"], "transcript_cursor": 4}
+
+
+def test_update_transcript_returns_the_lines_that_fall_out_of_the_window():
+    history = messages()
+    update, evicted = update_transcript({"messages": history}, budget=count_tokens("AI: Deleted a"))
+    assert update["transcript"] == ["AI: Deleted a"]
+    assert evicted[0] == "HUMAN: delete a" and len(evicted) == 3
+
+
+def test_render_transcript_puts_the_summary_first():
+    assert render_transcript(["HUMAN: hi", "AI: hello"]) == "HUMAN: hi\nAI: hello"
+    assert render_transcript(["AI: hello"], "user said hi") == "SUMMARY OF EARLIER STEPS: user said hi\nAI: hello"
+
+
+def test_evicted_lines_fold_into_the_summary(monkeypatch):
+    folded = []
+
+    def summarize_history(summary, evicted):
+        folded.append((summary, evicted))
+        return f"{summary} +{len(evicted)}".strip()
+
+    monkeypatch.setattr(graph, "TRANSCRIPT_SUMMARIZE", True)
+    monkeypatch.setattr(graph, "summarize_history", summarize_history)
+    monkeypatch.setattr(graph, "update_transcript", lambda state: update_transcript(state, budget=1))
+
+    state = {"messages": messages()[:2]}
+    update = graph.get_transcript(state)
+    assert update["transcript_summary"] == "+1"
+    assert graph._history(state, update) == "SUMMARY OF EARLIER STEPS: +1\n" + update["transcript"][-1]
+
+    state = {"messages": messages(), **update}
+    update = graph.get_transcript(state)
+    assert update["transcript_summary"] == "+1 +2"
+    assert folded[-1][0] == "+1" and update["transcript"] == ["AI: Deleted a"]
+
+    # Nothing evicted, nothing summarized
+    graph.get_transcript({"messages": messages(), **update})
+    assert len(folded) == 2
@@ -1,36 +1,208 @@
-from typing import Optional
-import requests
+import os
+import asyncio
+from typing import List, Optional
+import httpx
 from pydantic import BaseModel, Field
 from langchain_core.tools import tool
 from langgraph.types import interrupt
 from langchain_core.messages import ToolMessage
+from langchain_core.runnables.config import ContextThreadPoolExecutor
+from dashboard import dashboard, collection_cache
+from prefetch import read_prefetcher
 import json
 
+# Tools that never call `interrupt` and have no side effects; several of them requested in one
+# AIMessage run concurrently. Anything else runs alone, because a node that interrupts is
+# re-executed from the top on resume and would repeat earlier writes.
+READ_ONLY_TOOLS = {"get_all_data_collections", "get_collection_by_name"}
+TOOL_CONCURRENCY = int(os.getenv("TOOL_CONCURRENCY", "8"))
+
+_tool_executor = ContextThreadPoolExecutor(max_workers=TOOL_CONCURRENCY)
+
+# Tool results longer than this go into the transcript and the checkpoint as a short summary; the
+# full result is kept in Redis for TOOL_RESULT_TTL seconds and can be read back by any worker with
+# GET /threads/{thread_id}/tool-results/{ref}
+TOOL_RESULT_INLINE_CHARS = int(os.getenv("TOOL_RESULT_INLINE_CHARS", "2000"))
+TOOL_RESULT_PREVIEW_ITEMS = 3
+TOOL_RESULT_TTL = int(os.getenv("TOOL_RESULT_TTL", "3600"))
+TOOL_RESULT_PREFIX = "tool_result"
+COMPACT_NOTE = "Full result kept out of the transcript; call the tool again with narrower arguments to see specific entries."
+
+def runnable_tool_calls(tool_calls):
+    if tool_calls and all(tool_call["name"] in READ_ONLY_TOOLS for tool_call in tool_calls):
+        return tool_calls
+    return tool_calls[:1]
+
+def _thread_id(config):
+    return (config or {}).get("configurable", {}).get("thread_id")
+
+def _summarize(value, preview):
+    if isinstance(value, list):
+        return {"items": len(value), "first": value[:preview]} if preview else {"items": len(value)}
+    if isinstance(value, dict):
+        return {key: _summarize(item, preview) for key, item in value.items()}
+    if isinstance(value, str) and len(value) > 200:
+        return value[:200] + "..."
+    return value
+
+def compact_result(ref, result, limit=TOOL_RESULT_INLINE_CHARS):
+    """(content, compacted): the JSON of `result`, or a summary of it that refers to `ref` when it is longer than `limit`."""
+    content = json.dumps(result)
+    if len(content) <= limit:
+        return content, False
+    for preview in (TOOL_RESULT_PREVIEW_ITEMS, 1, 0):
+        summary = json.dumps({"ref": ref, "chars": len(content), "summary": _summarize(result, preview), "note": COMPACT_NOTE})
+        if len(summary) <= limit:
+            return summary, True
+    return json.dumps({"ref": ref, "chars": len(content), "note": COMPACT_NOTE}), True
+
+class ToolResultStore:
+    """Full results of compacted tool calls under tool_result:{thread_id}:{ref}, expiring after `ttl` seconds.
+
+    `client` is the checkpointer's Redis client (sync or asyncio), set when the app starts; without
+    one nothing is kept and reads find nothing.
+    """
+
+    def __init__(self, ttl=TOOL_RESULT_TTL):
+        self.client = None
+        self.ttl = ttl
+
+    def _key(self, thread_id, ref):
+        return f"{TOOL_RESULT_PREFIX}:{thread_id}:{ref}"
+
+    def put(self, thread_id, ref, result):
+        if self.client is not None:
+            self.client.set(self._key(thread_id, ref), json.dumps(result), ex=self.ttl)
+
+    async def aput(self, thread_id, ref, result):
+        if self.client is not None:
+            await self.client.set(self._key(thread_id, ref), json.dumps(result), ex=self.ttl)
+
+    def get(self, thread_id, ref):
+        value = self.client.get(self._key(thread_id, ref)) if self.client is not None else None
+        return json.loads(value) if value is not None else None
+
+    async def aget(self, thread_id, ref):
+        value = await self.client.get(self._key(thread_id, ref)) if self.client is not None else None
+        return json.loads(value) if value is not None else None
+
+compacted_results = ToolResultStore()
+
 class BasicToolNode:
     """A node that runs the tools requested in the last AIMessage."""
 
     def __init__(self, tools: list) -> None:
         self.tools_by_name = {tool.name: tool for tool in tools}
 
-    def __call__(self, inputs: dict):
+    def _tool_calls(self, inputs: dict):
         if messages := inputs.get("messages", []):
             message = messages[-1]
         else:
             raise ValueError("No message found in input")
-        outputs = []
-        for tool_call in message.tool_calls:
-            tool_result = self.tools_by_name[tool_call["name"]].invoke(
-                tool_call["args"]
-            )
-            outputs.append(
-                ToolMessage(
-                    content=json.dumps(tool_result),
-                    name=tool_call["name"],
-                    tool_call_id=tool_call["id"],
-                )
-            )
-            break
-        return {"messages": outputs}
+        return runnable_tool_calls(message.tool_calls)
+
+    def _output(self, tool_call, tool_result):
+        content, compacted = compact_result(tool_call["id"], tool_result)
+        return ToolMessage(
+            content=content,
+            name=tool_call["name"],
+            tool_call_id=tool_call["id"],
+            # Only the outcome is checkpointed, so advance_plan can judge a compacted result
+            artifact={"succeeded": result_succeeded(tool_call["name"], tool_result)} if compacted else None,
+        )
+
+    def _invoke(self, tool_call, thread_id=None):
+        prefetched = read_prefetcher.take(thread_id, tool_call["name"], tool_call["args"])
+        if prefetched is not None:
+            return prefetched
+        return self.tools_by_name[tool_call["name"]].invoke(tool_call["args"])
+
+    async def _ainvoke(self, tool_call, thread_id=None):
+        prefetched = read_prefetcher.take(thread_id, tool_call["name"], tool_call["args"])
+        if prefetched is not None:
+            return prefetched
+        return await self.tools_by_name[tool_call["name"]].ainvoke(tool_call["args"])
+
+    def __call__(self, inputs: dict, config=None):
+        tool_calls = self._tool_calls(inputs)
+        thread_id = _thread_id(config)
+        if len(tool_calls) == 1:
+            tool_results = [self._invoke(tool_calls[0], thread_id)]
+        else:
+            tool_results = list(_tool_executor.map(lambda tool_call: self._invoke(tool_call, thread_id), tool_calls))
+        messages = [self._output(tool_call, tool_result) for tool_call, tool_result in zip(tool_calls, tool_results)]
+        for message, tool_result in zip(messages, tool_results):
+            if message.artifact is not None:
+                compacted_results.put(thread_id, message.tool_call_id, tool_result)
+        return {"messages": messages}
+
+    async def acall(self, inputs: dict, config=None):
+        tool_calls = self._tool_calls(inputs)
+        thread_id = _thread_id(config)
+        tool_results = await asyncio.gather(*(self._ainvoke(tool_call, thread_id) for tool_call in tool_calls))
+        messages = [self._output(tool_call, tool_result) for tool_call, tool_result in zip(tool_calls, tool_results)]
+        await asyncio.gather(*(
+            compacted_results.aput(thread_id, message.tool_call_id, tool_result)
+            for message, tool_result in zip(messages, tool_results) if message.artifact is not None
+        ))
+        return {"messages": messages}
+
+
+# How to recognise a result that went as expected, per tool. Anything else (errors, user
+# rejections, talk_to_human answers) needs the replanner to decide what happens next.
+SUCCESS_CHECKS = {
+    "create_data_collection": lambda result: isinstance(result, dict) and str(result.get("output", "")).startswith("✅"),
+    "get_all_data_collections": lambda result: isinstance(result, dict) and "boxes" in result,
+    "get_collection_by_name": lambda result: isinstance(result, dict),
+    "update_data_collection": lambda result: isinstance(result, dict) and result.get("message") == "Successfully updated",
+    "delete_data_collection": lambda result: isinstance(result, dict) and result.get("message") == "Successfully deleted",
+    "create_data_collections_batch": lambda result: isinstance(result, dict) and result.get("failed") == 0 and result.get("succeeded", 0) > 0,
+    "update_data_collections_batch": lambda result: isinstance(result, dict) and result.get("failed") == 0 and result.get("succeeded", 0) > 0,
+    "delete_data_collections_batch": lambda result: isinstance(result, dict) and result.get("failed") == 0 and result.get("succeeded", 0) > 0,
+}
+
+def result_succeeded(name, result):
+    check = SUCCESS_CHECKS.get(name)
+    return check is not None and check(result)
+
+def tool_succeeded(message):
+    # A compacted result was checked on the full output before it was summarized
+    if message.artifact is not None:
+        return message.artifact["succeeded"]
+    try:
+        return result_succeeded(message.name, json.loads(message.content))
+    except (TypeError, ValueError):
+        return False
+
+
+# Each tool's dashboard logic is written once, as a flow: a generator that yields the request it
+# needs as (method, kwargs) and gets back the response, or has the transport's exception raised at
+# the yield. _send runs a flow with the sync client and _asend with the async one.
+def _send(flow):
+    try:
+        method, kwargs = next(flow)
+        while True:
+            try:
+                response = dashboard.request(method, **kwargs)
+            except Exception as e:
+                method, kwargs = flow.throw(e)
+            else:
+                method, kwargs = flow.send(response)
+    except StopIteration as done:
+        return done.value
+
+async def _asend(flow):
+    try:
+        method, kwargs = next(flow)
+        while True:
+            try:
+                response = await dashboard.arequest(method, **kwargs)
+            except Exception as e:
+                method, kwargs = flow.throw(e)
+            else:
+                method, kwargs = flow.send(response)
+    except StopIteration as done:
+        return done.value
 
 
 class DataCollectionInputSchema(BaseModel):
@@ -39,8 +211,7 @@ class DataCollectionInputSchema(BaseModel):
     type: str = Field(description="Type of the data collection, either it can be 'General' or 'Face Recognition'")
     description: str = Field(description="Description of the collection")
 
-@tool("create_data_collection", args_schema=DataCollectionInputSchema)
-def create_data_collection(name: str, type: str, description: str):
+def _create_flow(name, type, description):
     # Ask for confirmation from the user
     response = interrupt(
         {'interrupt': f"Trying to call `create_data_collection` with args {{'name': '{name}', 'type': '{type}', 'description': '{description}'}}. "
@@ -48,15 +219,14 @@ def create_data_collection(name: str, type: str, description: str):
     )
 
     if response["send"] == "Yes":
-        try:    
+        try:
             # API call to Next.js to insert a box (data collection)
-            res = requests.post(
-                "http://localhost:3000/api/boxes",  # ✅ Update URL if needed
-                json={"name": response['name'], "type": response['type'], "description": response['description']},
-                headers={"Content-Type": "application/json"},
-                timeout=5
-            )
+            res = yield "POST", {
+                "json": {"name": response['name'], "type": response['type'], "description": response['description']},
+                "headers": {"Content-Type": "application/json"},
+            }
             res.raise_for_status()
+            collection_cache.invalidate_name(response['name'])
             data = res.json()
             return {
                 "output": f"✅ Successfully created a data collection with name: {data['box']['name']}, "
@@ -68,37 +238,94 @@ def create_data_collection(name: str, type: str, description: str):
     elif response["type"] == "No":
         return {"output": "user did not agree to create the collection"}
 
-@tool("get_all_data_collections")
-def get_all_data_collection() -> str:
-    """Get brief details of all existing data collections from the dashboard"""
-    try:
-        response = requests.get("http://localhost:3000/api/boxes")
-        response.raise_for_status()
-        data = response.json()
-        return data["boxes"]
-    except Exception as e:
-        return f"Failed to fetch data collections: {str(e)}"
+@tool("create_data_collection", args_schema=DataCollectionInputSchema)
+def create_data_collection(name: str, type: str, description: str):
+    return _send(_create_flow(name, type, description))
+
+async def _acreate_data_collection(name: str, type: str, description: str):
+    return await _asend(_create_flow(name, type, description))
+
+create_data_collection.coroutine = _acreate_data_collection
+
+LIST_PAGE_SIZE = int(os.getenv("LIST_PAGE_SIZE", "20"))
+LIST_PAGE_MAX = 100
+LIST_DEFAULT_FIELDS = ["id", "name", "type"]
+
+class ListDataCollections(BaseModel):
+    """Get brief details of existing data collections, filtered and one page at a time"""
+    name_contains: Optional[str] = Field(default=None, description="Only collections whose name contains this text (case-insensitive)")
+    type: Optional[str] = Field(default=None, description="Only collections of this type, 'General' or 'Face Recognition'")
+    fields: Optional[List[str]] = Field(default=None, description="Fields to return per collection, default id, name and type")
+    limit: int = Field(default=LIST_PAGE_SIZE, description=f"Page size, at most {LIST_PAGE_MAX}")
+    offset: int = Field(default=0, description="Collections to skip, the next_offset of the previous page")
+
+def _list_page(boxes, name_contains, type, fields, limit, offset):
+    # Filtered over the cached full list, so every page and filter is served by one dashboard read
+    if name_contains:
+        boxes = [box for box in boxes if name_contains.lower() in str(box.get("name", "")).lower()]
+    if type:
+        boxes = [box for box in boxes if str(box.get("type", "")).lower() == type.lower()]
+    limit = max(1, min(limit, LIST_PAGE_MAX))
+    offset = max(offset, 0)
+    fields = fields or LIST_DEFAULT_FIELDS
+    return {
+        "total": len(boxes),
+        "offset": offset,
+        "next_offset": offset + limit if offset + limit < len(boxes) else None,
+        "boxes": [{field: box[field] for field in fields if field in box} for box in boxes[offset:offset + limit]],
+    }
+
+def _list_flow(name_contains, type, fields, limit, offset):
+    boxes, generation = collection_cache.get_all()
+    if boxes is None:
+        try:
+            response = yield "GET", {}
+            response.raise_for_status()
+            boxes = response.json()["boxes"]
+            collection_cache.put_all(boxes, generation)
+        except Exception as e:
+            return f"Failed to fetch data collections: {str(e)}"
+    return _list_page(boxes, name_contains, type, fields, limit, offset)
+
+@tool("get_all_data_collections", args_schema=ListDataCollections)
+def get_all_data_collection(name_contains: Optional[str] = None, type: Optional[str] = None, fields: Optional[List[str]] = None, limit: int = LIST_PAGE_SIZE, offset: int = 0):
+    """Get brief details of existing data collections from the dashboard, filtered by name or type and one page at a time"""
+    return _send(_list_flow(name_contains, type, fields, limit, offset))
+
+async def _aget_all_data_collection(name_contains: Optional[str] = None, type: Optional[str] = None, fields: Optional[List[str]] = None, limit: int = LIST_PAGE_SIZE, offset: int = 0):
+    return await _asend(_list_flow(name_contains, type, fields, limit, offset))
+
+get_all_data_collection.coroutine = _aget_all_data_collection
     
 class DataCollectionByName(BaseModel):
     """Get complete details of a specific collections including its id"""
     name: str = Field(description="Name of the data collection")
-    
-@tool("get_collection_by_name", args_schema=DataCollectionByName)
-def get_collection_by_name(name: str) -> str:
+
+def _by_name_flow(name):
+    box, generation = collection_cache.get_by_name(name)
+    if box is not None:
+        return box
     try:
-        response = requests.get(
-            "http://localhost:3000/api/boxes",
-            params={"name": name}
-        )
+        response = yield "GET", {"params": {"name": name}}
         response.raise_for_status()
         data = response.json()
+        collection_cache.put_by_name(name, data["box"], generation)
         return data["box"]  # because your Next.js returns { box: {...} }
-    except requests.HTTPError as e:
-        if response.status_code == 404:
+    except httpx.HTTPStatusError as e:
+        if e.response.status_code == 404:
             return f"Data collection with name '{name}' not found."
         return f"HTTP error: {str(e)}"
     except Exception as e:
         return f"Failed to fetch data collection: {str(e)}"
+
+@tool("get_collection_by_name", args_schema=DataCollectionByName)
+def get_collection_by_name(name: str) -> str:
+    return _send(_by_name_flow(name))
+
+async def _aget_collection_by_name(name: str) -> str:
+    return await _asend(_by_name_flow(name))
+
+get_collection_by_name.coroutine = _aget_collection_by_name
     
 
 class UpdateDataCollectionInputSchema(BaseModel):
@@ -108,9 +335,7 @@ class UpdateDataCollectionInputSchema(BaseModel):
     description: Optional[str] = Field(default=None, description="same or new description for the data collection")
     type: Optional[str] = Field(default=None, description="same or new type for the data collection")
 
-@tool("update_data_collection", args_schema=UpdateDataCollectionInputSchema)        
-def update_data_collection(id: str, name: Optional[str] = None, description: Optional[str] = None, type: Optional[str] = None):
-
+def _update_flow(id, name, description, type):
     update_args = {}
     if name is not None:
         update_args['name'] = name
@@ -129,36 +354,45 @@ def update_data_collection(id: str, name: Optional[str] = None, description: Opt
             'args': {**update_args, 'send': 'Yes/No', 'feedback': ''}
         }
     )
-    
-    if response["send"] == "Yes":
-        # Prepare update data
-        update_data = {"id": id}
-        if name:
-            update_data["name"] = response['name']
-        if description:
-            update_data["description"] = response['description']
-        if type:
-            update_data["type"] = response['type']
-        
-        # Make API call
-        api_url = "http://localhost:3000/api/boxes"  # Update with your actual API URL
-        response = requests.put(api_url, json=update_data)
-        
-        if response.status_code == 200: 
-            return {'message': 'Successfully updated'}
-        else:
-            return {'message': 'Backend api failed to update, please try later'}
-    else:
+
+    if response["send"] != "Yes":
         return {"message": f"User, rejected to update the collection, USER FEEDBACK: {response['feedback']}"}
+
+    # Prepare update data
+    update_data = {"id": id}
+    if name:
+        update_data["name"] = response['name']
+    if description:
+        update_data["description"] = response['description']
+    if type:
+        update_data["type"] = response['type']
+
+    # Make API call
+    try:
+        res = yield "PUT", {"json": update_data}
+    except Exception as e:
+        return {'message': f'Backend api failed to update, please try later: {str(e)}'}
+
+    if res.status_code == 200:
+        collection_cache.invalidate_id(id, update_data.get('name'))
+        return {'message': 'Successfully updated'}
+    return {'message': 'Backend api failed to update, please try later'}
+
+@tool("update_data_collection", args_schema=UpdateDataCollectionInputSchema)        
+def update_data_collection(id: str, name: Optional[str] = None, description: Optional[str] = None, type: Optional[str] = None):
+    return _send(_update_flow(id, name, description, type))
+
+async def _aupdate_data_collection(id: str, name: Optional[str] = None, description: Optional[str] = None, type: Optional[str] = None):
+    return await _asend(_update_flow(id, name, description, type))
+
+update_data_collection.coroutine = _aupdate_data_collection
     
 
 class DeleteDataCollectionInputSchema(BaseModel):
     """Delete a Data Collection in the dashboard, 'id' is mandatory to use this tool"""
     id: str = Field(description="id of the data collection")
 
-@tool("delete_data_collection", args_schema=DeleteDataCollectionInputSchema)
-def delete_data_collection(id: str):
-
+def _delete_flow(id):
     # Ask user for confirmation
     response = interrupt(
         {
@@ -167,22 +401,175 @@ def delete_data_collection(id: str):
         }
     )
 
-    if response["send"] == "Yes":
-        try:
-            # Call the DELETE API with id as a query parameter
-            api_url = "http://localhost:3000/api/boxes"
-            res = requests.delete(api_url, params={"id": id})
-
-            if res.status_code == 200:
-                return {'message': 'Successfully deleted'}
-            elif res.status_code == 404:
-                return {'message': 'Collection not found'}
-            else:
-                return {'message': f'Failed to delete: {res.status_code} {res.text}'}
-        except Exception as e:          
-            return {'message': f'Error during deletion: {str(e)}'}
-    else:
+    if response["send"] != "Yes":
         return {"message": "User rejected the deletion request."}
+    try:
+        # Call the DELETE API with id as a query parameter
+        res = yield "DELETE", {"params": {"id": id}}
+    except Exception as e:
+        return {'message': f'Error during deletion: {str(e)}'}
+    if res.status_code in (200, 404):
+        collection_cache.invalidate_id(id)
+    if res.status_code == 200:
+        return {'message': 'Successfully deleted'}
+    elif res.status_code == 404:
+        return {'message': 'Collection not found'}
+    return {'message': f'Failed to delete: {res.status_code} {res.text}'}
+
+@tool("delete_data_collection", args_schema=DeleteDataCollectionInputSchema)
+def delete_data_collection(id: str):
+    return _send(_delete_flow(id))
+
+async def _adelete_data_collection(id: str):
+    return await _asend(_delete_flow(id))
+
+delete_data_collection.coroutine = _adelete_data_collection
+    
+
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+
+def _run_batch(flow, items):
+    with ContextThreadPoolExecutor(max_workers=BATCH_CONCURRENCY) as executor:
+        return list(executor.map(lambda item: _send(flow(item)), items))
+
+async def _arun_batch(flow, items):
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def bounded(item):
+        async with semaphore:
+            return await _asend(flow(item))
+
+    return await asyncio.gather(*(bounded(item) for item in items))
+
+def _batch_summary(results):
+    failed = sum(1 for result in results if result["status"] == "failed")
+    return {"succeeded": len(results) - failed, "failed": failed, "results": results}
+
+def _plain_items(items):
+    # The tool receives the args_schema's models; the interrupt payload and the API need dicts
+    return [item.model_dump() if isinstance(item, BaseModel) else dict(item) for item in items]
+
+def _batch_items(response, items):
+    # The approval payload lets the user edit or drop items before they are sent
+    return [dict(item) for item in response.get("items", items)]
+
+
+class CreateDataCollectionsBatchInputSchema(BaseModel):
+    """Create several Data Collections in the dashboard with a single user approval"""
+    items: List[DataCollectionInputSchema] = Field(description="Collections to create")
+
+def _confirm_create_batch(items):
+    lines = '\n'.join(f"- name: '{item['name']}', type: '{item['type']}', description: '{item['description']}'" for item in items)
+    return interrupt(
+        {'interrupt': f"Trying to create {len(items)} data collections:\n{lines}\nPlease approve or suggest edits.",
+         'args': {'items': items, 'send': 'Yes/No'}}
+    )
+
+def _create_item_flow(item):
+    try:
+        res = yield "POST", {"json": item, "headers": {"Content-Type": "application/json"}}
+        res.raise_for_status()
+        collection_cache.invalidate_name(item['name'])
+        return {"name": item['name'], "status": "created"}
+    except Exception as e:
+        return {"name": item['name'], "status": "failed", "error": str(e)}
+
+@tool("create_data_collections_batch", args_schema=CreateDataCollectionsBatchInputSchema)
+def create_data_collections_batch(items: list):
+    items = _plain_items(items)
+    response = _confirm_create_batch(items)
+    if response["send"] == "Yes":
+        return _batch_summary(_run_batch(_create_item_flow, _batch_items(response, items)))
+    return {"message": "user did not agree to create the collections"}
+
+async def _acreate_data_collections_batch(items: list):
+    items = _plain_items(items)
+    response = _confirm_create_batch(items)
+    if response["send"] == "Yes":
+        return _batch_summary(await _arun_batch(_create_item_flow, _batch_items(response, items)))
+    return {"message": "user did not agree to create the collections"}
+
+create_data_collections_batch.coroutine = _acreate_data_collections_batch
+
+
+class UpdateDataCollectionsBatchInputSchema(BaseModel):
+    """Update several Data Collections in the dashboard with a single user approval, 'id' is mandatory for every item"""
+    items: List[UpdateDataCollectionInputSchema] = Field(description="Collections to update, each with its id and the fields to change")
+
+def _confirm_update_batch(items):
+    items = [{k: v for k, v in item.items() if v is not None} for item in items]
+    lines = '\n'.join(f"- {item}" for item in items)
+    return interrupt(
+        {'interrupt': f"Trying to update {len(items)} data collections:\n{lines}\nPlease approve or suggest edits.",
+         'args': {'items': items, 'send': 'Yes/No', 'feedback': ''}}
+    )
+
+def _update_item_flow(item):
+    item = {k: v for k, v in item.items() if v is not None}
+    try:
+        res = yield "PUT", {"json": item}
+    except Exception as e:
+        return {"id": item['id'], "status": "failed", "error": str(e)}
+    if res.status_code == 200:
+        collection_cache.invalidate_id(item['id'], item.get('name'))
+        return {"id": item['id'], "status": "updated"}
+    return {"id": item['id'], "status": "failed", "error": f"{res.status_code} {res.text}"}
+
+@tool("update_data_collections_batch", args_schema=UpdateDataCollectionsBatchInputSchema)
+def update_data_collections_batch(items: list):
+    items = _plain_items(items)
+    response = _confirm_update_batch(items)
+    if response["send"] == "Yes":
+        return _batch_summary(_run_batch(_update_item_flow, _batch_items(response, items)))
+    return {"message": f"User, rejected to update the collections, USER FEEDBACK: {response.get('feedback', '')}"}
+
+async def _aupdate_data_collections_batch(items: list):
+    items = _plain_items(items)
+    response = _confirm_update_batch(items)
+    if response["send"] == "Yes":
+        return _batch_summary(await _arun_batch(_update_item_flow, _batch_items(response, items)))
+    return {"message": f"User, rejected to update the collections, USER FEEDBACK: {response.get('feedback', '')}"}
+
+update_data_collections_batch.coroutine = _aupdate_data_collections_batch
+
+
+class DeleteDataCollectionsBatchInputSchema(BaseModel):
+    """Delete several Data Collections in the dashboard with a single user approval"""
+    ids: List[str] = Field(description="ids of the data collections to delete")
+
+def _confirm_delete_batch(ids):
+    return interrupt(
+        {'interrupt': f"Trying to delete {len(ids)} data collections with ids: {', '.join(ids)}. Please approve or reject.",
+         'args': {'ids': ids, 'send': 'Yes/No'}}
+    )
+
+def _delete_item_flow(id):
+    try:
+        res = yield "DELETE", {"params": {"id": id}}
+    except Exception as e:
+        return {"id": id, "status": "failed", "error": str(e)}
+    if res.status_code in (200, 404):
+        collection_cache.invalidate_id(id)
+    if res.status_code == 200:
+        return {"id": id, "status": "deleted"}
+    elif res.status_code == 404:
+        return {"id": id, "status": "not_found"}
+    return {"id": id, "status": "failed", "error": f"{res.status_code} {res.text}"}
+
+@tool("delete_data_collections_batch", args_schema=DeleteDataCollectionsBatchInputSchema)
+def delete_data_collections_batch(ids: list):
+    response = _confirm_delete_batch(ids)
+    if response["send"] == "Yes":
+        return _batch_summary(_run_batch(_delete_item_flow, response.get("ids", ids)))
+    return {"message": "User rejected the deletion request."}
+
+async def _adelete_data_collections_batch(ids: list):
+    response = _confirm_delete_batch(ids)
+    if response["send"] == "Yes":
+        return _batch_summary(await _arun_batch(_delete_item_flow, response.get("ids", ids)))
+    return {"message": "User rejected the deletion request."}
+
+delete_data_collections_batch.coroutine = _adelete_data_collections_batch
     
 
 class TalkToHuman(BaseModel):
@@ -200,4 +587,9 @@ def talk_to_human(question: str):
     #     return {"message": f"thanks, now proceed"} 
     # else:
     #     return {"message": "User requested to end the complete execution"}  
-    return response
\ No newline at end of file
+    return response
+
+async def _atalk_to_human(question: str):
+    return interrupt({'interrupt': question, 'args': {}})
+
+talk_to_human.coroutine = _atalk_to_human
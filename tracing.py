@@ -0,0 +1,38 @@
+import os
+import uuid
+import random
+import logging
+from contextvars import ContextVar
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# Fraction of prompts/plans logged at DEBUG; prompts are large and contain user data
+PROMPT_LOG_SAMPLE_RATE = float(os.getenv("PROMPT_LOG_SAMPLE_RATE", "0.1"))
+
+trace_id_var = ContextVar("trace_id", default="-")
+
+
+def new_trace_id(thread_id):
+    # The thread id prefix lets one grep find every request of a conversation
+    return f"{thread_id}:{uuid.uuid4().hex[:12]}"
+
+
+class _TraceIdFilter(logging.Filter):
+    def filter(self, record):
+        record.trace_id = trace_id_var.get()
+        return True
+
+
+logger = logging.getLogger("agentic_workflow")
+if not logger.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(trace_id)s] %(name)s: %(message)s"))
+    _handler.addFilter(_TraceIdFilter())
+    logger.addHandler(_handler)
+    logger.setLevel(LOG_LEVEL)
+    logger.propagate = False
+
+
+def log_sampled(label, text):
+    """Log `text` at DEBUG for a PROMPT_LOG_SAMPLE_RATE fraction of calls; free when DEBUG is off."""
+    if logger.isEnabledFor(logging.DEBUG) and random.random() < PROMPT_LOG_SAMPLE_RATE:
+        logger.debug("%s:\n%s", label, text)
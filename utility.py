@@ -1,30 +1,74 @@
+import os
+
+# Rough token budget for the history embedded in agent/replanner prompts (~4 chars per token)
+TRANSCRIPT_TOKEN_BUDGET = int(os.getenv("TRANSCRIPT_TOKEN_BUDGET", "4000"))
+TRANSCRIPT_SUMMARIZE = os.getenv("TRANSCRIPT_SUMMARIZE", "0") == "1"
+
+def format_message(message):
+    result = []
+    if hasattr(message, 'content') or isinstance(message, dict):
+        # Handle dict format (from your JSON)
+        if isinstance(message, dict):
+            msg_type = message.get('type', '')
+            content = message.get('content', '')
+            tool_calls = message.get('tool_calls', [])
+        else:
+            # Handle object format (LangChain message objects)
+            msg_type = type(message).__name__
+            content = getattr(message, 'content', '')
+            tool_calls = getattr(message, 'tool_calls', [])
+        
+        if 'Human' in msg_type:
+            result.append(f"HUMAN: {content}")
+        elif 'AI' in msg_type:
+            if tool_calls:
+                for tool_call in tool_calls:
+                    tool_name = tool_call.get('name', '')
+                    tool_args = tool_call.get('args', {})
+                    result.append(f"AI: called tool -> {tool_name} with args {tool_args}")
+            elif content:
+                result.append(f"AI: {content}")
+        elif 'Tool' in msg_type:
+            tool_name = message.get('name', 'unknown_tool') if isinstance(message, dict) else getattr(message, 'name', 'unknown_tool')
+            result.append(f"TOOL: {tool_name} returned -> {content}")
+    return result
+
 def filter_history(messages):
     result = []
     
     for message in messages:
-        if hasattr(message, 'content') or isinstance(message, dict):
-            # Handle dict format (from your JSON)
-            if isinstance(message, dict):
-                msg_type = message.get('type', '')
-                content = message.get('content', '')
-                tool_calls = message.get('tool_calls', [])
-            else:
-                # Handle object format (LangChain message objects)
-                msg_type = type(message).__name__
-                content = getattr(message, 'content', '')
-                tool_calls = getattr(message, 'tool_calls', [])
-            
-            if 'Human' in msg_type:
-                result.append(f"HUMAN: {content}")
-            elif 'AI' in msg_type:
-                if tool_calls:
-                    for tool_call in tool_calls:
-                        tool_name = tool_call.get('name', '')
-                        tool_args = tool_call.get('args', {})
-                        result.append(f"AI: called tool -> {tool_name} with args {tool_args}")
-                elif content:
-                    result.append(f"AI: {content}")
-            elif 'Tool' in msg_type:
-                tool_name = message.get('name', 'unknown_tool') if isinstance(message, dict) else getattr(message, 'name', 'unknown_tool')
-                result.append(f"TOOL: {tool_name} returned -> {content}")
-    return '\n'.join(result), result
\ No newline at end of file
+        result.extend(format_message(message))
+    return '\n'.join(result), result
+
+def count_tokens(text):
+    return len(text) // 4 + 1
+
+def apply_budget(lines, budget=TRANSCRIPT_TOKEN_BUDGET):
+    """Keep the newest lines that fit in `budget` tokens (always at least the last one); return (kept, evicted)."""
+    used = 0
+    start = len(lines)
+    while start > 0:
+        used += count_tokens(lines[start - 1])
+        if used > budget and start < len(lines):
+            break
+        start -= 1
+    return lines[start:], lines[:start]
+
+def update_transcript(state, budget=TRANSCRIPT_TOKEN_BUDGET):
+    """Render only the messages added since the last call and slide the window to the token budget.
+
+    Returns the state update and the lines that fell out of the window.
+    """
+    messages = state['messages']
+    cursor = state.get('transcript_cursor', 0)
+    lines = list(state.get('transcript') or [])
+    for message in messages[cursor:]:
+        lines.extend(format_message(message))
+    lines, evicted = apply_budget(lines, budget)
+    return {'transcript': lines, 'transcript_cursor': len(messages)}, evicted
+
+def render_transcript(transcript, summary=''):
+    history = '\n'.join(transcript)
+    if summary:
+        return f"SUMMARY OF EARLIER STEPS: {summary}\n{history}"
+    return history